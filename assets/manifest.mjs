@@ -0,0 +1,2 @@
+// Generated by assets_renderer, maps atlas names to their files.
+export default {};
@@ -0,0 +1,72 @@
+import json
+import os
+import re
+
+
+class AssetManifest:
+    """
+    Map from atlas names to the files they're saved as, written as a
+    JavaScript module for the frontend (`js/Images.mjs`) to import.
+    With content-hashed names, an atlas only gets a new URL when it
+    changes, so the files can be cached by browsers indefinitely.
+    """
+
+    file: str
+    entries: dict[str, str]
+
+    def __init__(self, file: str) -> None:
+        """
+        Loads the existing manifest, if any, so that partial builds
+        only replace the atlases they render.
+
+        Parameters
+        ----------
+        file
+            The manifest file name, such as `assets/manifest.mjs`.
+        """
+        self.file = file
+        self.entries = {}
+        if os.path.exists(file):
+            with open(file) as f:
+                # The module is a single object literal in json
+                match = re.search(r"\{.*\}", f.read(), re.DOTALL)
+            if match is not None:
+                self.entries = json.loads(match.group())
+
+    def set(self, name: str, file: str) -> None:
+        """
+        Set the file of an atlas and save the manifest. The previous hashed
+        file of the atlas is deleted, since nothing refers to it anymore.
+
+        Parameters
+        ----------
+        name
+            The atlas name, such as `redstone_wire.png`.
+        file
+            The name of the file it's saved as, in the same folder as the manifest.
+
+        Returns
+        -------
+        None
+        """
+        previous = self.entries.get(name)
+        if previous is not None and previous not in {name, file}:
+            path = os.path.join(os.path.dirname(self.file), previous)
+            if os.path.exists(path):
+                os.remove(path)
+        self.entries[name] = file
+        self.save()
+
+    def save(self) -> None:
+        """
+        Write the manifest module.
+
+        Returns
+        -------
+        None
+        """
+        with open(self.file, "w") as f:
+            f.write("// Generated by assets_renderer, maps atlas names to their files.\n")
+            f.write("export default ")
+            json.dump(dict(sorted(self.entries.items())), f, indent=4)
+            f.write(";\n")
@@ -0,0 +1,97 @@
+from typing import Callable, Iterable, Iterator, Optional
+
+
+class Constraints:
+    """
+    Declarative constraints on block states, used instead of a `key` function
+    to skip illegal states. Unlike `key`, which is called on every
+    combination after the full product is made, constraints are checked
+    while enumerating, so rejected states (and every state that starts
+    with them) are never made at all.
+
+    There are 3 kinds of constraints:
+    - fixed: a property must have a single value.
+    - allowed: a property can only have some of its values.
+    - relations: a function over a few properties, called with their
+      values in order, that must return true. It's checked as soon as
+      all of its properties have values.
+
+    .. code-block:: python
+
+        Constraints(
+            fixed={"instrument": "harp"},
+            allowed={"shape": ["straight", "inner_left", "outer_left"]},
+            relations=[(("west", "east"), lambda west, east: not west == east == "tall")],
+        )
+    """
+
+    fixed: dict[str, str]
+    allowed: dict[str, set[str]]
+    relations: list[tuple[tuple[str, ...], Callable[..., bool]]]
+
+    def __init__(
+        self,
+        *,
+        fixed: Optional[dict[str, str]] = None,
+        allowed: Optional[dict[str, Iterable[str]]] = None,
+        relations: Optional[list[tuple[tuple[str, ...], Callable[..., bool]]]] = None,
+    ) -> None:
+        self.fixed = dict(fixed) if fixed is not None else {}
+        self.allowed = {k: set(v) for k, v in allowed.items()} if allowed is not None else {}
+        self.relations = list(relations) if relations is not None else []
+
+    def enumerate(self, values: list[tuple[str, list[str]]]) -> Iterator[tuple[str, ...]]:
+        """
+        Enumerate the combinations of values that satisfy the constraints,
+        in the same order as :func:`itertools.product`.
+
+        Parameters
+        ----------
+        values
+            A list of (property, values) pairs, in the order of the product.
+
+        Returns
+        -------
+        Iterator
+            Tuples of values, one value for each property.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If a constraint refers to a property that is not in `values`.
+        """
+        keys = [k for k, _ in values]
+        for k in [*self.fixed, *self.allowed, *(k for ks, _ in self.relations for k in ks)]:
+            if k not in keys:
+                raise ValueError(f"Constraint on unknown property {k}, expected one of {keys}.")
+
+        # Fixed and allowed values shrink the domains before anything is enumerated
+        domains = []
+        for k, v in values:
+            if k in self.fixed:
+                v = [value for value in v if value == self.fixed[k]]
+            if k in self.allowed:
+                v = [value for value in v if value in self.allowed[k]]
+            domains.append(v)
+
+        # Each relation is checked at the depth where its last property is set
+        checks: list[list[tuple[list[int], Callable[..., bool]]]] = [[] for _ in keys]
+        for ks, predicate in self.relations:
+            indices = [keys.index(k) for k in ks]
+            checks[max(indices)].append((indices, predicate))
+
+        combination: list[str] = [""] * len(keys)
+
+        def dfs(depth: int) -> Iterator[tuple[str, ...]]:
+            if depth == len(keys):
+                yield tuple(combination)
+                return
+            for value in domains[depth]:
+                combination[depth] = value
+                if all(
+                    predicate(*(combination[i] for i in indices))
+                    for indices, predicate in checks[depth]
+                ):
+                    yield from dfs(depth + 1)
+
+        return dfs(0)
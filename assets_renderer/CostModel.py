@@ -0,0 +1,110 @@
+import json
+import os
+
+
+class CostModel:
+    """
+    Estimates how long atlases take to render, for scheduling the longest
+    work first. An atlas costs about its number of faces drawn, measured
+    against the seconds per tile and faces per tile of past builds, which
+    are kept in a json file. Atlases never built before use the average
+    seconds per face of all the others.
+    """
+
+    # Seconds per face drawn, before anything was measured
+    DEFAULT_FACE_SECONDS = 0.002
+    # Weight of the latest build in the history, the rest is older builds
+    SMOOTHING = 0.5
+
+    file: str
+    history: dict[str, dict[str, float]]  # atlas -> seconds and faces per tile
+
+    def __init__(self, file: str) -> None:
+        """
+        Loads the existing history, if any.
+
+        Parameters
+        ----------
+        file
+            The history file name, such as `assets_renderer/build_costs.json`.
+        """
+        self.file = file
+        self.history = {}
+        if os.path.exists(file):
+            with open(file) as f:
+                self.history = json.load(f)
+
+    def face_seconds(self) -> float:
+        """
+        Get the average seconds per face drawn of every atlas in the history.
+
+        Returns
+        -------
+        float
+            The seconds per face.
+        """
+        seconds = sum(entry["seconds"] for entry in self.history.values())
+        faces = sum(entry["faces"] for entry in self.history.values())
+        return seconds / faces if faces else self.DEFAULT_FACE_SECONDS
+
+    def estimate(self, name: str, tiles: int, faces: float) -> float:
+        """
+        Estimate the cost of an atlas.
+
+        Parameters
+        ----------
+        name
+            The atlas name in the history.
+        tiles
+            The number of tiles.
+        faces
+            The average number of faces per tile.
+
+        Returns
+        -------
+        float
+            The estimated seconds to render every tile.
+        """
+        entry = self.history.get(name)
+        if entry is None or entry["faces"] == 0:
+            return tiles * faces * self.face_seconds()
+        # Scaled in case the models changed since
+        return tiles * entry["seconds"] * faces / entry["faces"]
+
+    def record(self, name: str, tiles: int, faces: float, seconds: float) -> None:
+        """
+        Add a build of an atlas to the history.
+
+        Parameters
+        ----------
+        name
+            The atlas name in the history.
+        tiles
+            The number of tiles rendered.
+        faces
+            The average number of faces per tile.
+        seconds
+            The seconds it took to render them.
+
+        Returns
+        -------
+        None
+        """
+        if tiles == 0:
+            return
+        entry = {"seconds": seconds / tiles, "faces": faces}
+        previous = self.history.get(name)
+        if previous is not None:
+            entry = {k: previous[k] + (entry[k] - previous[k]) * self.SMOOTHING for k in entry}
+        self.history[name] = entry
+
+    def save(self) -> None:
+        """
+        Write the history.
+
+        Returns
+        -------
+        None
+        """
+        with open(self.file, "w") as f:
+            json.dump(self.history, f, indent=4, sort_keys=True)
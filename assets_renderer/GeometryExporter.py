@@ -0,0 +1,140 @@
+from Renderer import ProcessedFace, Renderer
+from ShelfPacker import ShelfPacker
+from TextureCache import TextureCache
+
+import json
+import numpy as np
+import os
+from PIL import Image
+from typing import Optional
+
+
+class GeometryExporter:
+    """
+    Collects the projected faces of every state in an atlas, so the browser
+    can draw blocks itself instead of downloading prebaked tiles.
+    Saves a json file of faces and one texture sheet shared by all states
+    of the atlas. Sheets aren't shared between atlases, so that each atlas
+    can be exported on its own (by workers, shards or :class:`~.Watcher`);
+    textures used by several atlases are in each of their sheets.
+
+    Each face is a list of
+    `[x1, y1, x2, y2, x3, y3, x4, y4, u, v, s, t, texture, rotation, tint, z1, z2, z3, z4]`:
+    the screen quad in pixels of a :attr:`Renderer.size` tile, the uv (in
+    sixteenths of the texture, like model files), the index of the texture
+    in the sheet, the texture rotation, whether the face takes the block
+    color, and the depth of each corner (larger is closer).
+    Faces are in the order the renderer draws them (first drawn wins ties),
+    and `order` lists them from back to front for painter's algorithm.
+    """
+
+    FORMAT = [
+        "x1", "y1", "x2", "y2", "x3", "y3", "x4", "y4",
+        "u", "v", "s", "t",
+        "texture", "rotation", "tint",
+        "z1", "z2", "z3", "z4",
+    ]
+
+    states: list[dict]
+    texture_ids: dict[str, int]
+
+    def __init__(self) -> None:
+        self.states = []
+        self.texture_ids = {}
+
+    def add(
+        self,
+        file: str,
+        state_dict: dict[str, str],
+        position: tuple[int, int],
+        faces: list[ProcessedFace],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> None:
+        """
+        Add the faces of one block state.
+
+        Parameters
+        ----------
+        file
+            The block state file name.
+        state_dict
+            A dictionary of block states.
+        position
+            The (x, y) position of the state in the atlas grid.
+        faces
+            The processed faces of all the models of the state, in drawing order.
+        color
+            An optional tuple of (r, g, b, a) specifying the block color (colormap).
+
+        Returns
+        -------
+        None
+        """
+        records = []
+        for face in faces:
+            texture = self.texture_ids.setdefault(face.texture, len(self.texture_ids))
+            records.append([
+                *(round(float(v), 3) for v in face.face_2D.flatten()),
+                *(round(float(v), 3) for v in face.uv),
+                texture,
+                int(face.rotation),
+                int(face.color),
+                *(round(float(v), 4) for v in face.face_3D[:, 2]),
+            ])
+        depths = [float(np.mean(face.face_3D[:, 2])) for face in faces]
+        self.states.append({
+            "file": file,
+            "state": state_dict,
+            "position": list(position),
+            "color": list(color) if color is not None else None,
+            "faces": records,
+            "order": sorted(range(len(faces)), key=lambda i: depths[i]),
+        })
+
+    def save(self, textures: TextureCache, file: str, sheet_file: str) -> None:
+        """
+        Save the faces and the texture sheet.
+        Only the first frame of animated textures is used, like the renderer.
+
+        Parameters
+        ----------
+        textures
+            The :class:`~.TextureCache` to take textures from.
+        file
+            The output json file name.
+        sheet_file
+            The output texture sheet file name.
+
+        Returns
+        -------
+        None
+        """
+        names = list(self.texture_ids)
+        images = []
+        for name in names:
+            image = textures.get(name)
+            images.append(image.crop((0, 0, image.width, image.width)))
+        positions, size = ShelfPacker().pack([image.size for image in images])
+        # Pngs can't be empty, atlases with no visible faces have no textures
+        sheet = Image.new("RGBA", (max(size[0], 1), max(size[1], 1)))
+        for image, position in zip(images, positions):
+            sheet.paste(image, position)
+        for path in [file, sheet_file]:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        sheet.save(sheet_file)
+
+        with open(file, "w") as f:
+            json.dump(
+                {
+                    "tile_size": list(Renderer.size),
+                    "format": GeometryExporter.FORMAT,
+                    "textures": [
+                        {"name": name, "rect": [*position, *image.size]}
+                        for name, image, position in zip(names, images, positions)
+                    ],
+                    "states": self.states,
+                },
+                f,
+                separators=(",", ":"),
+            )
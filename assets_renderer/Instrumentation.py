@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+
+
+class Instrumentation:
+    """
+    Opt-in counters and timing spans for render builds.
+    Spans are saved in the Chrome trace event format, so a build can be
+    opened in a trace viewer (chrome://tracing or Perfetto).
+    Disabled by default; hot paths only check :attr:`enabled` once per
+    call, so leaving it off costs next to nothing.
+    """
+
+    enabled: bool
+    counters: Counter[str]
+    events: list[dict]
+    start: float
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.counters = Counter()
+        self.events = []
+        self.start = perf_counter()
+
+    def enable(self) -> None:
+        """
+        Start recording counters and spans.
+
+        Returns
+        -------
+        None
+        """
+        self.enabled = True
+        self.start = perf_counter()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Add to a counter. Does nothing if disabled.
+
+        Parameters
+        ----------
+        name
+            Name of the counter.
+        amount
+            Amount to add.
+
+        Returns
+        -------
+        None
+        """
+        if self.enabled:
+            self.counters[name] += amount
+
+    def _timestamp(self) -> float:
+        # Trace events are in microseconds
+        return (perf_counter() - self.start) * 1e6
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[None]:
+        """
+        Record the time spent in a `with` block as a complete ("X") event.
+        Counters at the end of an atlas span are also recorded as a counter
+        ("C") event, to show them along the timeline.
+
+        Parameters
+        ----------
+        name
+            Name of the span, such as the atlas output or tile state.
+        category
+            Category of the span, such as `"atlas"` or `"tile"`.
+        args
+            Extra data shown when the span is selected.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = self._timestamp()
+        try:
+            yield
+        finally:
+            end = self._timestamp()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": end - start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            self.events.append(event)
+            if category == "atlas":
+                self.events.append({
+                    "name": "counters",
+                    "ph": "C",
+                    "ts": end,
+                    "pid": os.getpid(),
+                    "args": dict(self.counters),
+                })
+
+    def save(self, file: str) -> None:
+        """
+        Save the recorded spans and counters to a Chrome trace JSON file.
+
+        Parameters
+        ----------
+        file
+            The output file name.
+
+        Returns
+        -------
+        None
+        """
+        with open(file, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": self.events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"counters": dict(self.counters)},
+                },
+                f,
+            )
+
+    def summary(self) -> str:
+        """
+        Get the counters as a human-readable table.
+
+        Returns
+        -------
+        str
+            One counter per line.
+        """
+        width = max((len(name) for name in self.counters), default=0)
+        return "\n".join(
+            f"{name:<{width}} {value:>14,}" for name, value in sorted(self.counters.items())
+        )
+
+
+instrumentation = Instrumentation()
@@ -1,14 +1,47 @@
 from ParserCollection import ParserCollection
 from StateParser import StateParser
-from Renderer import Renderer
+from StateTable import StateTable
+from Renderer import PROJECTIONS, ProcessedFace, Projection, Renderer
+from GeometryExporter import GeometryExporter
+from TileStore import TileStore
+from AssetManifest import AssetManifest
+from Layer import Layer
+from TexelMap import TexelMap
+from RasterBackend import RasterBackend
+from Instrumentation import instrumentation
+from TextureCache import TextureCache
+from ShelfPacker import ShelfPacker
+from concurrent.futures import ThreadPoolExecutor
+from Constraints import Constraints
+from collections import Counter
+from dataclasses import dataclass, field
 from itertools import product
 from PIL import Image
-from math import prod
-from typing import Callable, Optional
+from typing import Callable, Iterator, Optional
+import hashlib
+import io
+import json
+import numpy as np
 import os.path
+import zlib
 from time import perf_counter
 
 
+@dataclass
+class Tile:
+    """
+    A block state of an atlas, as yielded by :meth:`Joiner.iter_tiles`.
+    """
+    file: str
+    state_dict: dict[str, str]
+    index: int  # in rendering order
+    position: tuple[int, int]  # in the atlas, in tiles
+    color: Optional[tuple[int, int, int, int]]
+    image: Optional[Image.Image]  # None if not rasterizing or in another shard
+    texel_map: Optional[TexelMap]  # only when saving animations
+    views: list[Image.Image] = field(default_factory=list)  # in each of Joiner.views
+
+
 class Joiner:
     """
     Joiner that renders blocks and joins them together in one texture atlas.
@@ -17,140 +50,1206 @@ class Joiner:
     namespace: str
     output_root: str
     parser_collection: ParserCollection
+    state_parsers: dict[str, StateParser]
+    state_tables: dict[str, Optional[StateTable]]  # by block state file path
+    state_table_root: Optional[str]
+    textures: TextureCache
+    layers: dict[tuple, Layer]  # multipart parts, by projection, model and rotation
+    shapes: dict[str, tuple[str, list[str]]]  # elements without textures, and face textures, by model
+    families: dict[tuple, Optional[tuple[TexelMap, list[str]]]]  # see get_family
+    renderers: dict[tuple, Renderer]  # reused for every tile, by projection and size
+    geometry_root: Optional[str]
+    rasterize: bool
+    tiles: Optional[TileStore]
+    shard: Optional[tuple[int, int]]
+    merge: bool
+    resume: bool
+    manifest: Optional[AssetManifest]
+    hash_names: bool
+    animation_root: Optional[str]
+    backend: Optional[RasterBackend]
+    views: list[Projection]  # drawn besides the oblique projection, each to its own atlas
+    trim_root: Optional[str]
+    retexture: bool
+    plan_only: bool  # if set, parse_state only records atlases, for a preflight
+    encoder: Optional[Callable[[Callable[[], None]], None]]  # runs saving, if not set right away (see Pipeline)
+    atlases: dict[str, tuple[list[str], list[str], dict]]  # parse_state arguments, by output
+    dependencies: dict[str, set[str]]  # asset files read for each atlas
 
-    def __init__(self, root: str, namespace: str, output_root: str) -> None:
+    def __init__(
+        self,
+        root: str,
+        namespace: str,
+        output_root: str,
+        *,
+        geometry_root: Optional[str] = None,
+        rasterize: bool = True,
+        tiles: Optional[TileStore] = None,
+        shard: Optional[tuple[int, int]] = None,
+        merge: bool = False,
+        resume: bool = False,
+        manifest: Optional[AssetManifest] = None,
+        hash_names: bool = False,
+        animation_root: Optional[str] = None,
+        backend: Optional[RasterBackend] = None,
+        views: Optional[list[Projection]] = None,
+        state_table_root: Optional[str] = None,
+        parser_collection: Optional[ParserCollection] = None,
+        trim_root: Optional[str] = None,
+        retexture: bool = True,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        root
+            The assets root, containing one folder for each namespace.
+        namespace
+            The namespace of the block state files.
+        output_root
+            The folder atlases are saved to.
+        geometry_root
+            If given, the projected faces of each atlas are also exported
+            to this folder with a :class:`~.GeometryExporter`.
+        rasterize
+            Whether to render atlases. Can be turned off to only export geometry.
+        tiles
+            A :class:`~.TileStore` that every rendered tile is saved to as soon
+            as it's done, used as a checkpoint and for tiles rendered by shards.
+            Required with `shard`, `merge` or `resume`.
+        shard
+            An (index, count) pair. If given, only the tiles of this shard are
+            rendered and saved to `tiles`, and no atlases are saved.
+            Every tile of every atlas goes to exactly one of the `count` shards,
+            so `count` independent processes with the same shard count
+            render everything once.
+        merge
+            If true, atlases are assembled from `tiles` instead of rendering.
+        resume
+            If true, tiles already in `tiles` are loaded instead of rendered,
+            to continue an interrupted build. Tiles of an atlas whose layout
+            or block state files changed since are discarded (edits to models
+            or textures aren't detected, so clear the folder after those).
+        manifest
+            An :class:`~.AssetManifest` that saved atlases are recorded in.
+        hash_names
+            If true, atlases are saved as `name.<hash>.png` with a hash of their
+            contents, and recorded in `manifest`.
+        animation_root
+            If given, atlases with animated textures are also saved to this
+            folder as a strip of frames, with a `.mcmeta` file of frame times
+            like Minecraft's animated textures. Geometry is only worked out
+            once per tile, and each frame is drawn again from a :class:`~.TexelMap`.
+        backend
+            The :class:`~.RasterBackend` tiles are drawn with, by default the reference one.
+        views
+            Other :class:`~.Projection` to draw every tile in, such as
+            `PROJECTIONS["top"]`. Each view gets its own atlas, saved as
+            `<output>_<view>.png`. Models are only loaded and rotated once
+            per tile for all views. Can't be used with `tiles`.
+        state_table_root
+            If given, block state files are compiled into a :class:`~.StateTable`
+            saved to this folder, so that later builds skip parsing and resolving
+            them until they change. Tables are always used within a build.
+        parser_collection
+            The :class:`~.ParserCollection` models are loaded into, shared
+            with other joiners so that models and their parents are only
+            parsed once. By default, the joiner has its own.
+        trim_root
+            If given, atlases are also saved to this folder as a sheet of
+            tiles cropped to their visible pixels, with a json file of where
+            each tile is (see :meth:`trim_atlas`). The grid atlases are still
+            saved to `output_root`, since the editor reads those.
+        retexture
+            If true, blocks of the same shape are replayed from a recorded
+            :class:`~.TexelMap` instead of rasterized (see :meth:`get_family`).
+            Turned off to time the rasterizer.
+        """
+        if hash_names and manifest is None:
+            raise ValueError("A manifest is required for content-hashed names.")
+        if (shard is not None or merge or resume) and tiles is None:
+            raise ValueError("A tile store is required to shard, merge or resume builds.")
+        if shard is not None and not 0 <= shard[0] < shard[1]:
+            raise ValueError(f"Invalid shard {shard[0]}/{shard[1]}.")
+        if animation_root is not None and (shard is not None or merge):
+            raise ValueError("Animated atlases need all their tiles rendered in the same build.")
+        if views and tiles is not None:
+            raise ValueError("Views need all their tiles rendered in the same build.")
         self.root = root
         self.namespace = namespace
         self.output_root = output_root
-        self.parser_collection = ParserCollection(
-            root, "models"
+        self.geometry_root = geometry_root
+        self.rasterize = rasterize
+        self.tiles = tiles
+        self.shard = shard
+        self.merge = merge
+        self.resume = resume
+        self.manifest = manifest
+        self.hash_names = hash_names
+        self.animation_root = animation_root
+        self.backend = backend
+        self.views = views if views is not None else []
+        self.trim_root = trim_root
+        self.retexture = retexture
+        self.state_table_root = state_table_root
+        self.parser_collection = (
+            parser_collection if parser_collection is not None else ParserCollection(root, "models")
         )
+        self.state_parsers = {}
+        self.state_tables = {}
+        self.textures = TextureCache(root)
+        self.layers = {}
+        self.shapes = {}
+        self.families = {}
+        self.renderers = {}
+        self.plan_only = False
+        self.encoder = None
+        self.atlases = {}
+        self.dependencies = {}
 
-    def parse_state(
+    def get_state_parser(self, file: str) -> StateParser:
+        """
+        Get the parsed block state file, parsing it the first time.
+        Its :class:`~.StateTable` is compiled too, or loaded from
+        :attr:`state_table_root` along with its states instead of parsing.
+
+        Parameters
+        ----------
+        file
+            The block state file name.
+
+        Returns
+        -------
+        :class:`~.StateParser`
+            The parsed block state file.
+        """
+        if file not in self.state_parsers:
+            state_parser = StateParser(os.path.join(self.root, self.namespace, "blockstates", file))
+            table, path = None, None
+            if self.state_table_root is not None:
+                state_parser.load()
+                path = StateTable.path(self.state_table_root, state_parser.source or "")
+                table = StateTable.load(path)
+            if table is not None:
+                # Same contents, so the same states
+                state_parser.states = table.domains
+            else:
+                state_parser.parse()
+                table = StateTable.compile(state_parser)
+                if table is not None and path is not None:
+                    table.save(path)
+            self.state_tables[state_parser.file] = table
+            self.state_parsers[file] = state_parser
+        return self.state_parsers[file]
+
+    def get_state(self, state_parser: StateParser, state_dict: dict[str, str]) -> list[dict]:
+        """
+        Get the models a block state applies, looked up in the
+        :class:`~.StateTable` of its file when it has one.
+
+        Parameters
+        ----------
+        state_parser
+            The parsed :class:`~.StateParser` of the block, from :meth:`get_state_parser`.
+        state_dict
+            A dictionary of block states.
+
+        Returns
+        -------
+        list
+            The json entries of the models, like :meth:`StateParser.get_state`.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the state isn't in the file.
+        """
+        table = self.state_tables.get(state_parser.file)
+        index = table.index(state_dict) if table is not None else None
+        if index is None:
+            # Values the file doesn't have, such as custom ones
+            return state_parser.get_state(state_dict)
+        return table.resolve(index)
+
+    def prefetch(self, files: list[str], workers: Optional[int] = None) -> None:
+        """
+        Read all block state files, models, parents and textures an atlas
+        needs on a thread pool, so that file reads overlap instead of
+        happening one by one in the middle of rendering.
+        Anything that fails to load is skipped here, and raises
+        when it's actually needed.
+
+        Parameters
+        ----------
+        files
+            A list of block state file names.
+        workers
+            Maximum number of threads, by default decided by :class:`ThreadPoolExecutor`.
+
+        Returns
+        -------
+        None
+        """
+        def parse_state_file(file: str) -> Optional[StateParser]:
+            try:
+                return self.get_state_parser(file)
+            except (OSError, ValueError):
+                return None
+
+        def resolve_textures(model: str) -> set[str]:
+            if model not in self.parser_collection:
+                return set()
+            parser = self.parser_collection.get(model)
+            textures = set()
+            try:
+                for element in parser.get_elements(parser):
+                    element.do_textures()
+                    textures.update(face["texture"] for face in element.faces.values())
+            except (KeyError, ValueError):
+                pass
+            return textures
+
+        def load_texture(texture: str) -> None:
+            try:
+                self.textures.load(texture)
+            except OSError:
+                pass
+
+        with ThreadPoolExecutor(workers) as executor:
+            models = set()
+            for state_parser in executor.map(parse_state_file, files):
+                if state_parser is not None:
+                    models.update(state_parser.get_models())
+            self.parser_collection.preload(models, executor)
+            textures = set().union(*map(resolve_textures, models))
+            list(executor.map(load_texture, textures))
+
+    def get_dependencies(self, files: list[str]) -> set[str]:
+        """
+        Get the asset files an atlas is made from: block state files,
+        models and their parents, and textures with their `.mcmeta` files.
+        Files that are missing are included, so that adding them is noticed,
+        and anything that fails to parse is skipped.
+
+        Parameters
+        ----------
+        files
+            A list of block state file names.
+
+        Returns
+        -------
+        set
+            The normalized paths of the files.
+        """
+        paths = set()
+        models = set()
+        for file in files:
+            paths.add(os.path.join(self.root, self.namespace, "blockstates", file))
+            try:
+                models.update(self.get_state_parser(file).get_models())
+            except (OSError, ValueError):
+                pass
+        for model in models:
+            paths.add(self.parser_collection.path(model))
+            if model not in self.parser_collection:
+                continue
+            parser = self.parser_collection.get(model)
+            ancestor = parser.parent
+            while ancestor is not None:
+                paths.add(ancestor.file)
+                ancestor = ancestor.parent
+            try:
+                for element in parser.get_elements(parser):
+                    element.do_textures()
+                    for face in element.faces.values():
+                        path = self.textures.path(face["texture"])
+                        paths.update([path, f"{path}.mcmeta"])
+            except (KeyError, ValueError):
+                pass
+        return {os.path.normpath(path) for path in paths}
+
+    def invalidate(self, paths: set[str]) -> set[str]:
+        """
+        Drop everything cached from changed asset files, so they're read
+        again next time they're needed.
+
+        Parameters
+        ----------
+        paths
+            The normalized paths of the changed files.
+
+        Returns
+        -------
+        set
+            The outputs of the atlases (rendered with :meth:`parse_state`)
+            that use any of the files.
+        """
+        for file, state_parser in list(self.state_parsers.items()):
+            if os.path.normpath(state_parser.file) in paths:
+                del self.state_parsers[file]
+                self.state_tables.pop(state_parser.file, None)
+
+        # Children keep a reference to their parent's parser, so they go too
+        dropped = False
+        for model, parser in list(self.parser_collection.models.items()):
+            ancestor = parser
+            while ancestor is not None:
+                if os.path.normpath(ancestor.file) in paths:
+                    del self.parser_collection.models[model]
+                    dropped = True
+                    break
+                ancestor = ancestor.parent
+        if dropped:
+            self.parser_collection.prune()
+
+        for texture in list(self.textures.textures):
+            path = os.path.normpath(self.textures.path(texture))
+            if path in paths or f"{path}.mcmeta" in paths:
+                del self.textures.textures[texture]
+                self.textures.animations.pop(texture, None)
+                self.textures.opacity.pop(texture, None)
+
+        self.layers.clear()
+        self.renderers.clear()  # compiled models
+        self.shapes.clear()
+        self.families.clear()
+        return {output for output, dependencies in self.dependencies.items() if not dependencies.isdisjoint(paths)}
+
+    def rebuild(self, output: str) -> None:
+        """
+        Render an atlas again with the same arguments it was last rendered with.
+
+        Parameters
+        ----------
+        output
+            The output file name of the atlas.
+
+        Returns
+        -------
+        None
+        """
+        files, keys_order, kwargs = self.atlases[output]
+        self.parse_state(files, keys_order, output, **kwargs)
+
+    def get_renderer(self, projection: Projection) -> Renderer:
+        """
+        Get the renderer of a projection, cleared for the next tile.
+        Renderers are kept between tiles so that their buffers are
+        only allocated once, so get images out before the next call.
+
+        Parameters
+        ----------
+        projection
+            The :class:`~.Projection` to draw with.
+
+        Returns
+        -------
+        :class:`~.Renderer`
+            The cleared renderer.
+        """
+        # The size is part of the key, since Renderer.size can be changed (see benchmark.py)
+        key = (projection.name, projection.size())
+        if key not in self.renderers:
+            self.renderers[key] = Renderer(self.textures, self.backend, projection)
+        r = self.renderers[key]
+        r.clear()
+        return r
+
+    def get_shape(self, model: str) -> tuple[str, list[str]]:
+        """
+        Get the geometry of a model, apart from its textures.
+
+        Parameters
+        ----------
+        model
+            The model identifier.
+
+        Returns
+        -------
+        tuple
+            The elements as json without their textures, and
+            the resolved texture of each face in the same order.
+        """
+        if model not in self.shapes:
+            if model not in self.parser_collection:
+                self.parser_collection.add(model)
+            parser = self.parser_collection.get(model)
+            elements = parser.get_elements(parser)
+            # Faces in their order in the file, since it's the order they're
+            # drawn in (first drawn wins ties) and the order of the textures
+            shape = json.dumps(
+                [
+                    [
+                        element.start,
+                        element.end,
+                        element.rotation,
+                        [
+                            [direction, {k: v for k, v in face.items() if k != "texture"}]
+                            for direction, face in element.faces.items()
+                        ],
+                    ]
+                    for element in elements
+                ]
+            )
+            textures = []
+            for element in elements:
+                element.do_textures()
+                textures.extend(face["texture"] for face in element.faces.values())
+            self.shapes[model] = (shape, textures)
+        return self.shapes[model]
+
+    def get_family(self, models: list[dict], size: tuple[int, int]) -> tuple[tuple, list[str]]:
+        """
+        Get the shape family of a block state: everything its models are
+        drawn from except the textures, so that states of the same family
+        differ only by which textures are drawn (like the 16 colors of wool).
+        A :class:`~.TexelMap` recorded for one state of a family (see
+        :attr:`families`) draws any other by replaying it with its textures.
+
+        Parameters
+        ----------
+        models
+            The models the state applies, from :meth:`get_state`.
+        size
+            The tile size.
+
+        Returns
+        -------
+        tuple
+            The family, and the distinct textures of the state in the order
+            they're first used. States of a family use their textures in the same places.
+        """
+        parts, textures = [], []
+        for model in models:
+            shape, face_textures = self.get_shape(model["model"])
+            parts.append((shape, model.get("x", 0), model.get("y", 0), model.get("z", 0), model.get("uvlock", False)))
+            textures.extend(face_textures)
+        slots = {texture: i for i, texture in enumerate(dict.fromkeys(textures))}
+        # Texel coordinates are scaled by the texture width, and
+        # opaque textures can hide faces (see Renderer.cull_hidden)
+        widths = tuple((self.textures.get(texture).width, self.textures.opaque(texture)) for texture in slots)
+        return (size, tuple(parts), tuple(slots[texture] for texture in textures), widths), list(slots)
+
+    def render_tile(
+        self,
+        state_parser: StateParser,
+        state_dict: dict[str, str],
+        color: Optional[tuple[int, int, int, int]] = None,
+        texel_map: Optional[TexelMap] = None,
+    ) -> Image.Image:
+        """
+        Render a single block state to an image, in the oblique projection.
+        See :meth:`render_views` for the parameters.
+
+        Returns
+        -------
+        Image.Image
+            The rendered block.
+        """
+        return self.render_views(state_parser, state_dict, color, texel_map, [])[0]
+
+    def render_views(
+        self,
+        state_parser: StateParser,
+        state_dict: dict[str, str],
+        color: Optional[tuple[int, int, int, int]] = None,
+        texel_map: Optional[TexelMap] = None,
+        views: Optional[list[Projection]] = None,
+    ) -> list[Image.Image]:
+        """
+        Render a single block state to an image in each projection.
+        Models are compiled once for each projection and rotation
+        (see :meth:`Renderer.compile`), and drawn from there.
+        Parts of multipart blocks are rendered once into a :class:`~.Layer`
+        and composited for every combination they appear in, since the same
+        part is shared by a large number of combinations. Combinations with
+        a part that isn't exact to composite (see :attr:`Layer.stacked`) are
+        drawn directly.
+        When recording a texel map, every part is drawn directly instead.
+        Other blocks drawn only in the oblique projection are replayed from
+        the texel map of their shape family when it's recorded (see :meth:`get_family`).
+
+        Parameters
+        ----------
+        state_parser
+            The parsed :class:`~.StateParser` of the block.
+        state_dict
+            A dictionary of block states.
+        color
+            An optional tuple of (r, g, b, a) specifying the block color (colormap).
+        texel_map
+            A :class:`~.TexelMap` to record the drawn fragments of the oblique projection to.
+        views
+            The projections to draw besides the oblique one, by default :attr:`views`.
+
+        Returns
+        -------
+        list
+            The rendered block in the oblique projection, then in each view.
+        """
+        projections = [PROJECTIONS["oblique"], *(views if views is not None else self.views)]
+        multipart = next(iter(state_parser.properties.keys())) == "multipart" and texel_map is None
+        layers: list[list[Layer]] = [[] for _ in projections]
+        # Multipart parts are drawn with the same renderers, since
+        # layers copy what they need and the tile is composited from them
+        renderers = [self.get_renderer(projection) for projection in projections]
+        models = self.get_state(state_parser, state_dict)
+        family, record = None, None
+        if self.retexture and not multipart and texel_map is None and len(projections) == 1:
+            family, textures = self.get_family(models, renderers[0].size)
+            if self.families.get(family) is not None:
+                recorded, recorded_textures = self.families[family]
+                arrays = {
+                    old: np.asarray(self.textures.get(new))
+                    for old, new in zip(recorded_textures, textures)
+                }
+                return [Image.fromarray(recorded.replay(arrays, color))]
+            # Recording draws with the reference backend, so with a faster one
+            # only families that come up a second time are recorded
+            if family in self.families or renderers[0].backend.name == "python":
+                record = (TexelMap(), textures)
+                texel_map = record[0]
+            else:
+                self.families[family] = None
+        renderers[0].texel_map = texel_map
+        parts = []
+        for model in models:
+            if model["model"] not in self.parser_collection:
+                self.parser_collection.add(model["model"])
+            parts.append((model["model"], {
+                "x": model.get("x", 0),
+                "y": model.get("y", 0),
+                "z": model.get("z", 0),
+                "uv_lock": model.get("uvlock", False),
+            }))
+        if multipart:
+            for r, part_layers in zip(renderers, layers):
+                for model, transform in parts:
+                    layer_key = (r.projection.name, model, *transform.values())
+                    if layer_key not in self.layers:
+                        part = self.get_renderer(r.projection)
+                        part.draw(part.compile(self.parser_collection.get(model), **transform))
+                        self.layers[layer_key] = Layer(part)
+                    part_layers.append(self.layers[layer_key])
+            if not any(layer.stacked for part_layers in layers for layer in part_layers):
+                return [Layer.composite(part_layers, color, r.size) for r, part_layers in zip(renderers, layers)]
+            # Parts with stacked translucent pixels don't composite exactly, so they're drawn directly
+            renderers = [self.get_renderer(projection) for projection in projections]
+        for r in renderers:
+            for model, transform in parts:
+                r.draw(r.compile(self.parser_collection.get(model), **transform), color)
+        # Only kept once drawn, in case a model fails
+        if record is not None:
+            self.families[family] = record
+        # Copied out, since the renderers are reused
+        return [r.get_image().copy() for r in renderers]
+
+    def in_shard(self, output: str, index: int) -> bool:
+        """
+        Check whether a tile belongs to this joiner's shard.
+        Tiles are dealt round robin, starting from a shard chosen by
+        a hash of the atlas name so that small atlases don't all land
+        on the first shard. The hash is stable across machines and runs.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        index
+            The index of the tile in the atlas.
+
+        Returns
+        -------
+        bool
+            Whether the tile should be rendered here.
+        """
+        if self.shard is None:
+            return True
+        shard, count = self.shard
+        return (zlib.crc32(output.encode()) + index) % count == shard
+
+    def get_tile(
         self,
-        files: list[str],
-        keys_order: list[str],
         output: str,
-        /,
-        *,
-        custom_values: Optional[dict[str, list]] = None,
-        key: Optional[Callable[[dict[str, str]], bool]] = None,
-        color: Optional[Callable[[dict[str, str]], tuple[int, int, int, int]]] = None,
+        index: int,
+        state_parser: StateParser,
+        state_dict: dict[str, str],
+        color: Optional[tuple[int, int, int, int]] = None,
+        texel_map: Optional[TexelMap] = None,
+    ) -> Optional[Image.Image]:
+        """
+        Get a tile of an atlas, either by rendering it or from the tile store
+        depending on the shard, merge and resume settings.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        index
+            The index of the tile in the atlas.
+        state_parser
+            The parsed :class:`~.StateParser` of the block.
+        state_dict
+            A dictionary of block states.
+        color
+            An optional tuple of (r, g, b, a) specifying the block color (colormap).
+        texel_map
+            A :class:`~.TexelMap` to record the drawn fragments to.
+            The tile is always rendered then, even when resuming.
+
+        Returns
+        -------
+        Image.Image or None
+            The tile, or None if it belongs to another shard.
+        """
+        if self.merge and self.tiles is not None:
+            return self.tiles.load(output, index)
+        if not self.in_shard(output, index):
+            return None
+        if texel_map is None and self.resume and self.tiles is not None and self.tiles.has(output, index):
+            return self.tiles.load(output, index)
+        with instrumentation.span(state_parser.file, "tile", **state_dict):
+            image = self.render_tile(state_parser, state_dict, color, texel_map)
+        if self.tiles is not None:
+            self.tiles.save(output, index, image)
+        return image
+
+    def get_faces(self, state_parser: StateParser, state_dict: dict[str, str]) -> list[ProcessedFace]:
+        """
+        Get the projected faces of a block state without drawing them.
+
+        Parameters
+        ----------
+        state_parser
+            The parsed :class:`~.StateParser` of the block.
+        state_dict
+            A dictionary of block states.
+
+        Returns
+        -------
+        list
+            The visible :class:`~.ProcessedFace` of every model, in drawing order.
+        """
+        r = self.get_renderer(PROJECTIONS["oblique"])
+        faces = []
+        for model in self.get_state(state_parser, state_dict):
+            if model["model"] not in self.parser_collection:
+                self.parser_collection.add(model["model"])
+            prepared = r.prepare(
+                self.parser_collection.get(model["model"]),
+                x=model.get("x", 0),
+                y=model.get("y", 0),
+                z=model.get("z", 0),
+                uv_lock=model.get("uvlock", False),
+            )
+            faces.extend(face for element_faces in r.process_faces(*prepared) for face in element_faces)
+        return faces
+
+    def save_atlas(self, atlas: Image.Image, output: str, size: Optional[tuple[int, int]] = None) -> None:
+        """
+        Save an atlas, under a content-hashed name if enabled,
+        and record it in the manifest. With :attr:`trim_root`, the trimmed
+        sheet is saved there too, with its json next to it (`wire.json` for `wire.png`).
+
+        Parameters
+        ----------
+        atlas
+            The atlas image.
+        output
+            The output file name.
+        size
+            The tile size, by default :attr:`Renderer.size`.
+
+        Returns
+        -------
+        None
+        """
+        if self.trim_root is not None:
+            sheet, sprites = self.trim_atlas(atlas, size)
+            os.makedirs(self.trim_root, exist_ok=True)
+            sheet.save(os.path.join(self.trim_root, output))
+            with open(os.path.join(self.trim_root, f"{os.path.splitext(output)[0]}.json"), "w") as f:
+                json.dump(sprites, f, separators=(",", ":"))
+
+        buffer = io.BytesIO()
+        atlas.save(buffer, "png")
+        self.save_file(buffer.getvalue(), output)
+
+    def save_file(self, data: bytes, output: str) -> None:
+        """
+        Save a file next to the atlases, under a content-hashed name if
+        enabled, and record it in the manifest.
+
+        Parameters
+        ----------
+        data
+            The contents of the file.
+        output
+            The output file name.
+
+        Returns
+        -------
+        None
+        """
+        if not self.hash_names:
+            with open(os.path.join(self.output_root, output), "wb") as f:
+                f.write(data)
+            if self.manifest is not None:
+                self.manifest.set(output, output)
+            return
+
+        name, extension = os.path.splitext(output)
+        file = f"{name}.{hashlib.sha256(data).hexdigest()[:10]}{extension}"
+        path = os.path.join(self.output_root, file)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        if self.manifest is not None:
+            self.manifest.set(output, file)
+
+    def trim_atlas(self, atlas: Image.Image, size: Optional[tuple[int, int]] = None) -> tuple[Image.Image, dict]:
+        """
+        Crop every tile of an atlas to the bounding box of its visible pixels,
+        and pack the crops into a sheet with a :class:`~.ShelfPacker`.
+        Tiles that crop to the same image are packed once.
+
+        The json of the sheet has the `tile_size` and number of `columns`
+        of the atlas grid, and a sprite for each cell in atlas order, null
+        if the cell is empty. Each sprite is a list in the order of
+        `format`: `[x, y, width, height, offset_x, offset_y]`, the rectangle
+        in the sheet and its position in the cell.
+
+        Parameters
+        ----------
+        atlas
+            The atlas, a grid of tiles.
+        size
+            The tile size, by default :attr:`Renderer.size`.
+
+        Returns
+        -------
+        tuple
+            The sheet, and its json.
+        """
+        width, height = size if size is not None else Renderer.size
+        columns = atlas.width // width
+        cells: list[Optional[tuple[int, int, int]]] = []  # sprite, offset
+        sprites: dict[tuple, int] = {}  # by size and pixels
+        images: list[Image.Image] = []
+        for i in range(columns * (atlas.height // height)):
+            y, x = divmod(i, columns)
+            tile = atlas.crop((x * width, y * height, (x + 1) * width, (y + 1) * height))
+            bbox = tile.getchannel("A").getbbox()
+            if bbox is None:
+                cells.append(None)
+                continue
+            image = tile.crop(bbox)
+            key = (image.size, image.tobytes())
+            if key not in sprites:
+                sprites[key] = len(images)
+                images.append(image)
+            cells.append((sprites[key], bbox[0], bbox[1]))
+
+        # Shelves as wide as the grid never take more room than the grid,
+        # a square sheet is usually smaller
+        packings = [ShelfPacker(max_width).pack([image.size for image in images]) for max_width in [None, atlas.width]]
+        positions, sheet_size = min(packings, key=lambda packing: packing[1][0] * packing[1][1])
+        # Pngs can't be empty
+        sheet = Image.new("RGBA", (max(sheet_size[0], 1), max(sheet_size[1], 1)))
+        for image, position in zip(images, positions):
+            sheet.paste(image, position)
+        return sheet, {
+            "tile_size": [width, height],
+            "columns": columns,
+            "format": ["x", "y", "width", "height", "offset_x", "offset_y"],
+            "sprites": [
+                None if cell is None else [*positions[cell[0]], *images[cell[0]].size, cell[1], cell[2]]
+                for cell in cells
+            ],
+        }
+
+    def save_animation(
+        self,
+        atlas: Image.Image,
+        output: str,
+        tiles: list[tuple[tuple[int, int], TexelMap, Optional[tuple[int, int, int, int]]]],
     ) -> None:
         """
-        Parse state of file, printing its status as it goes.
+        Save the frames of an atlas as a vertical strip, and their
+        durations in a `.mcmeta` file next to it.
+        Only tiles with animated textures are drawn again for each frame.
 
         Parameters
         ----------
-        files
-            A list of file names to parse from.
-        keys_order
-            A list of keys specifying the order the `product` should be done in.
+        atlas
+            The atlas image, used for tiles that aren't animated.
         output
             The output file name.
-        custom_values
-            Custom values if not all values are used in the assets.
-            By default, the :class:`StateParser` will parse the source for values.
+        tiles
+            The (x, y) position, texel map and color of each animated tile.
+
+        Returns
+        -------
+        None
+        """
+        if self.animation_root is None:
+            return
+        used = set().union(*(texel_map.textures() for _, texel_map, _ in tiles))
+        timeline = self.textures.timeline(used)
+        if len(timeline) == 0:
+            return
+
+        static = {texture: np.asarray(self.textures.get(texture)) for texture in used}
+        strip = Image.new("RGBA", (atlas.width, atlas.height * len(timeline)))
+        for frame, (_, indices) in enumerate(timeline):
+            textures = {
+                **static,
+                **{texture: np.asarray(self.textures.frame(texture, index)) for texture, index in indices.items()},
+            }
+            top = frame * atlas.height
+            strip.paste(atlas, (0, top))
+            for (x, y), texel_map, color in tiles:
+                image = Image.fromarray(texel_map.replay(textures, color))
+                strip.paste(image, (x * Renderer.size[0], top + y * Renderer.size[1]))
+
+        os.makedirs(self.animation_root, exist_ok=True)
+        file = os.path.join(self.animation_root, output)
+        strip.save(file)
+        with open(f"{file}.mcmeta", "w") as f:
+            frames = [{"index": frame, "time": time} for frame, (time, _) in enumerate(timeline)]
+            json.dump({"animation": {"frames": frames}}, f)
+
+    def enumerate_states(
+        self,
+        values: list[tuple[str, list[str]]],
+        key: Optional[Callable[[dict[str, str]], bool]] = None,
+        constraints: Optional[Constraints] = None,
+    ) -> Iterator[dict[str, str]]:
+        """
+        Enumerate the legal block states, in the order of the product of values.
+
+        Parameters
+        ----------
+        values
+            A list of (key, values) pairs, in the order of the product.
         key
             A function that is called for each value using the value dictionary,
             used to filter through some illegal block states.
-        color
-            A function that is called for each value using the value dictionary
-            (similar to `key`) that returns the color of the block, used for color maps.
+        constraints
+            :class:`~.Constraints` pruning the product before it's made.
 
         Returns
         -------
-        None
+        Iterator
+            Dictionaries of block states.
+        """
+        keys = [value[0] for value in values]
+        if constraints is not None:
+            combinations = constraints.enumerate(values)
+        else:
+            combinations = product(*(value[1] for value in values))
+        for combination in combinations:
+            state_dict = dict(zip(keys, combination))  # Dict creation from k/v
+            if key is None or key(state_dict):
+                yield state_dict
+
+    def get_layout(
+        self,
+        files: list[str],
+        keys_order: list[str],
+        custom_values: Optional[dict[str, list]] = None,
+        key: Optional[Callable[[dict[str, str]], bool]] = None,
+        constraints: Optional[Constraints] = None,
+    ) -> tuple[list[tuple[str, list[str]]], int, int]:
+        """
+        Work out the size of an atlas and the order its states are enumerated in.
+        See :meth:`parse_state` for the parameters.
+
+        Returns
+        -------
+        tuple
+            The (key, values) pairs in the order of the product, and the width
+            and height of the atlas in tiles.
 
         Raises
         ------
         :exc:`ValueError`
-            If the keys_order is incorrect
+            If the keys_order is incorrect, or constraints refer to unknown keys.
         """
         # If using multiple files, and keys_order exists, they must be
         # the exact same format for all the files, otherwise the renderer breaks.
 
         # Note: "by" means width by height
-        # If key exists, skipped textures are counted as non-existent
+        # If key or constraints exist, skipped textures are counted as non-existent
         # If one file and no keys_order, 1 by 1
         # If one file and 1 keys_order, length of only state by 1
         # If one file and more, length of first state by max length of combinations of remaining states
         # If multiple files, combination of states by number of files
         file = files[0]  # Arbitrary one, doesn't matter
-        state_parser = StateParser(os.path.join(self.root, self.namespace, "blockstates", file))
-        state_parser.parse()
+        state_parser = self.get_state_parser(file)
         states = custom_values if custom_values is not None else state_parser.states
         if set(keys_order) != set(states.keys()):
             raise ValueError(f"Keys order incorrect for {file}, expected {set(state_parser.states.keys())}.")
         values = sorted(states.items(), key=lambda x: keys_order.index(x[0]))
-        lens = [len(value[1]) for value in values]
         if len(files) == 1:
             if len(keys_order) == 0:
                 width = height = 1
             elif len(keys_order) == 1:
-                if key is not None:
-                    width = 0
-                    height = 1
-                    for combination in values[0][1]:
-                        if key(dict(zip(keys_order, [combination]))):
-                            width += 1
-                else:
-                    width, height = lens[0], 1
+                width = sum(1 for _ in self.enumerate_states(values, key, constraints))
+                height = 1
             else:
-                if key is not None:
-                    width = 0
-                    height = 0
-                    file = files[0]
-                    for combination_start in values[0][1]:
-                        height_ = 0
-                        for combination_end in product(*(value[1] for value in values[1:])):
-                            if key(dict(zip(keys_order, [combination_start, *combination_end]))):
-                                height_ += 1
-                        if height_ != 0:
-                            width += 1
-                            height = max(height, height_)
-                    values = [*values[1:], values[0]]
-                    keys_order = [*keys_order[1:], keys_order[0]]
-                else:
-                    width, height = lens[0], prod(lens[1:])
-                    values = [*values[1:], values[0]]
-                    keys_order = [*keys_order[1:], keys_order[0]]
+                columns = Counter(
+                    state_dict[keys_order[0]]
+                    for state_dict in self.enumerate_states(values, key, constraints)
+                )
+                width, height = len(columns), max(columns.values(), default=0)
+                values = [*values[1:], values[0]]
         else:
-            if key is None:
-                width, height = prod(lens), len(files)
-            else:
-                width, height = 0, len(files)
-                for combination in product(*(value[1] for value in values)):
-                    if key(dict(zip(keys_order, combination))):
-                        width += 1
+            width = sum(1 for _ in self.enumerate_states(values, key, constraints))
+            height = len(files)
+        return values, width, height
+
+    def prepare_tiles(
+        self,
+        files: list[str],
+        output: str,
+        values: list[tuple[str, list]],
+        width: int,
+        height: int,
+    ) -> None:
+        """
+        Check the layout of the stored tiles of an atlas before its tiles are
+        rendered or merged. Tiles of an outdated layout are cleared, except
+        in shards. Does nothing without :attr:`tiles`.
+
+        Parameters
+        ----------
+        files
+            The block state files of the atlas.
+        output
+            The atlas output file name.
+        values
+            The values of the atlas, from :meth:`get_layout`.
+        width
+            The atlas width in tiles.
+        height
+            The atlas height in tiles.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If merging tiles that were made with a different layout.
+        """
+        if self.tiles is None:
+            return
+        # Block state files are part of the layout, since
+        # they decide what each tile is
+        fingerprint = hashlib.sha1()
+        for file in files:
+            fingerprint.update(str(self.get_state_parser(file).source).encode())
+        layout = {
+            "files": files,
+            "keys_order": [value[0] for value in values],
+            "width": width,
+            "height": height,
+            "fingerprint": fingerprint.hexdigest(),
+        }
+        stored_layout = self.tiles.load_layout(output)
+        if self.merge:
+            if stored_layout != layout:
+                raise ValueError(f"Stored tiles of {output} were made with a different layout.")
+        else:
+            # Shards start from an empty folder, and clearing here
+            # could race with another shard that already started
+            if stored_layout != layout and self.shard is None:
+                self.tiles.clear(output)
+            self.tiles.save_layout(output, layout)
 
-        atlas = Image.new("RGBA", (width * Renderer.size[0], height * Renderer.size[1]))
+    def iter_tiles(
+        self,
+        files: list[str],
+        keys_order: list[str],
+        /,
+        *,
+        output: Optional[str] = None,
+        custom_values: Optional[dict[str, list]] = None,
+        key: Optional[Callable[[dict[str, str]], bool]] = None,
+        constraints: Optional[Constraints] = None,
+        color: Optional[Callable[[dict[str, str]], tuple[int, int, int, int]]] = None,
+        indices: Optional[range] = None,
+    ) -> Iterator[Tile]:
+        """
+        Render the tiles of an atlas one at a time, in atlas order, without
+        making the atlas. See :meth:`parse_state` for the parameters.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name. Only needed to shard, merge or
+            checkpoint tiles with :attr:`tiles`; without it, tiles are always
+            rendered and nothing is written.
+        indices
+            Only yield the tiles with these indices, for splitting
+            an atlas into batches. By default, all tiles.
+
+        Returns
+        -------
+        Iterator
+            A :class:`Tile` for each legal block state.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the keys_order is incorrect, or constraints refer to unknown keys.
+        """
+        values, width, _ = self.get_layout(files, keys_order, custom_values, key, constraints)
+        if not self.merge:
+            self.prefetch(files)
+        # Parts and shapes are rarely shared between atlases
+        self.layers.clear()
+        self.families.clear()
         i = 0
         for file in files:
-            start = perf_counter()
-            state_parser = StateParser(
-                os.path.join(self.root, self.namespace, "blockstates", file)
-            )
-            state_parser.parse()
-            for combination in product(*(value[1] for value in values)):
-                print(f"{i / (width * height):7.2%} - {perf_counter() - start:6.2f} - {file}", end="\r", flush=True)
-                state_dict = dict(zip(keys_order, combination))  # Dict creation from k/v
-                if key is not None and not key(state_dict):
+            state_parser = self.get_state_parser(file)
+            for state_dict in self.enumerate_states(values, key, constraints):
+                if indices is not None and i not in indices:
+                    i += 1
                     continue
-                r = Renderer()
-                for model in state_parser.get_state(state_dict):
-                    if model["model"] not in self.parser_collection.models:
-                        self.parser_collection.add(model["model"])
-                    r.render(
-                        self.parser_collection.get(model["model"]),
-                        x=model.get("x", 0),
-                        y=model.get("y", 0),
-                        z=model.get("z", 0),
-                        color=(color(state_dict) if color is not None else None),
-                        uv_lock=model.get("uvlock", False),
-                    )
                 y, x = divmod(i, width)
-                atlas.paste(r.get_image(), (x * Renderer.size[0], y * Renderer.size[1]))
-                i += 1  # Skip ones skipped by `key`
+                tile_color = color(state_dict) if color is not None else None
+                texel_map = TexelMap() if self.animation_root is not None and self.rasterize else None
+                image, views = None, []
+                if self.rasterize and self.views:
+                    # Never with a tile store, so every tile is rendered
+                    with instrumentation.span(state_parser.file, "tile", **state_dict):
+                        image, *views = self.render_views(state_parser, state_dict, tile_color, texel_map)
+                elif self.rasterize and output is not None:
+                    image = self.get_tile(output, i, state_parser, state_dict, tile_color, texel_map)
+                elif self.rasterize:
+                    with instrumentation.span(state_parser.file, "tile", **state_dict):
+                        image = self.render_tile(state_parser, state_dict, tile_color, texel_map)
+                yield Tile(file, state_dict, i, (x, y), tile_color, image, texel_map, views)
+                i += 1
+
+    def parse_state(
+        self,
+        files: list[str],
+        keys_order: list[str],
+        output: str,
+        /,
+        *,
+        custom_values: Optional[dict[str, list]] = None,
+        key: Optional[Callable[[dict[str, str]], bool]] = None,
+        constraints: Optional[Constraints] = None,
+        color: Optional[Callable[[dict[str, str]], tuple[int, int, int, int]]] = None,
+    ) -> None:
+        """
+        Parse state of file, printing its status as it goes.
+        Collects the tiles of :meth:`iter_tiles` into an atlas and saves it.
+        With :attr:`plan_only`, the atlas is only recorded in :attr:`atlases`.
+
+        Parameters
+        ----------
+        files
+            A list of file names to parse from.
+        keys_order
+            A list of keys specifying the order the `product` should be done in.
+        output
+            The output file name.
+        custom_values
+            Custom values if not all values are used in the assets.
+            By default, the :class:`StateParser` will parse the source for values.
+        key
+            A function that is called for each value using the value dictionary,
+            used to filter through some illegal block states.
+        constraints
+            :class:`~.Constraints` on the values, used like `key` but checked
+            while enumerating so that illegal states are never made.
+            Can be used together with `key`.
+        color
+            A function that is called for each value using the value dictionary
+            (similar to `key`) that returns the color of the block, used for color maps.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the keys_order is incorrect, or constraints refer to unknown keys.
+        """
+        self.atlases[output] = (
+            files,
+            keys_order,
+            {"custom_values": custom_values, "key": key, "constraints": constraints, "color": color},
+        )
+        if self.plan_only:
+            return
+        # Before rendering too, so that an atlas that fails is still rebuilt when fixed
+        self.dependencies[output] = self.get_dependencies(files)
+        values, width, height = self.get_layout(files, keys_order, custom_values, key, constraints)
+
+        self.prepare_tiles(files, output, values, width, height)
+
+        with instrumentation.span(output, "atlas", files=files):
+            atlas = Image.new("RGBA", (width * Renderer.size[0], height * Renderer.size[1]))
+            view_atlases = [
+                Image.new("RGBA", (width * view.size()[0], height * view.size()[1])) for view in self.views
+            ]
+            # Geometry is cheap, so it's left to the final (unsharded) build
+            geometry = GeometryExporter() if self.geometry_root is not None and self.shard is None else None
+            animated_tiles = []
+            file, start, i = files[0], perf_counter(), 0
+            tiles = self.iter_tiles(
+                files,
+                keys_order,
+                output=output,
+                custom_values=custom_values,
+                key=key,
+                constraints=constraints,
+                color=color,
+            )
+            for tile in tiles:
+                if tile.file != file:
+                    print(f"{i / (width * height):7.2%} - {perf_counter() - start:6.2f} - {file}", flush=True)
+                    file, start = tile.file, perf_counter()
+                i = tile.index
+                print(f"{i / (width * height):7.2%} - {perf_counter() - start:6.2f} - {file}", end="\r", flush=True)
+                x, y = tile.position
+                if geometry is not None:
+                    faces = self.get_faces(self.get_state_parser(file), tile.state_dict)
+                    geometry.add(file, tile.state_dict, (x, y), faces, tile.color)
+                if tile.image is not None:
+                    atlas.paste(tile.image, (x * Renderer.size[0], y * Renderer.size[1]))
+                for view, view_atlas, image in zip(self.views, view_atlases, tile.views):
+                    view_atlas.paste(image, (x * view.size()[0], y * view.size()[1]))
+                # Only animated tiles are kept, the rest are in the atlas
+                if tile.texel_map is not None and any(map(self.textures.animation, tile.texel_map.textures())):
+                    animated_tiles.append(((x, y), tile.texel_map, tile.color))
+                i += 1
             print(f"{i / (width * height):7.2%} - {perf_counter() - start:6.2f} - {file}", flush=True)
-        atlas.save(os.path.join(self.output_root, output))
+            if geometry is not None and self.geometry_root is not None:
+                name = os.path.splitext(output)[0]
+                geometry.save(
+                    self.textures,
+                    os.path.join(self.geometry_root, f"{name}.json"),
+                    os.path.join(self.geometry_root, f"{name}_textures.png"),
+                )
+            if self.rasterize and self.shard is None:
+                def save() -> None:
+                    self.save_atlas(atlas, output)
+                    self.save_animation(atlas, output, animated_tiles)
+                    name, extension = os.path.splitext(output)
+                    for view, view_atlas in zip(self.views, view_atlases):
+                        self.save_atlas(view_atlas, f"{name}_{view.name}{extension}", view.size())
+
+                if self.encoder is not None:
+                    self.encoder(save)
+                else:
+                    save()
+        # Now with everything the models refer to, since they're loaded
+        self.dependencies[output] = self.get_dependencies(files)
@@ -0,0 +1,84 @@
+import Renderer
+
+import numpy as np
+import numpy.typing as npt
+
+from PIL import Image
+from typing import Optional
+
+
+class Layer:
+    """
+    A single rendered part of a block (one model with its rotation),
+    kept together with its depth so that it can be composited with
+    other parts later instead of being rendered again.
+    Indexing is [y][x] like images, unlike :attr:`Renderer.depth_buffer`.
+    """
+
+    pixels: npt.NDArray[np.uint8]  # untinted rgba
+    depth: npt.NDArray[np.float64]  # depth of the pixel that was drawn last
+    opaque_depth: npt.NDArray[np.float32]  # depth buffer after rendering
+    tinted: npt.NDArray[np.bool_]  # whether the drawn pixel takes the colormap
+    stacked: bool  # whether a translucent pixel was drawn over, so compositing isn't exact
+
+    def __init__(self, renderer: "Renderer.Renderer"):
+        """
+        Takes a layer from a renderer that rendered one part without a color.
+
+        Parameters
+        ----------
+        renderer
+            The :class:`~.Renderer` the part was rendered with.
+        """
+        self.pixels = np.asarray(renderer.get_image(), dtype=np.uint8)
+        self.depth = renderer.pixel_depth.T.copy()
+        self.opaque_depth = renderer.depth_buffer.T.copy()
+        self.tinted = renderer.tint_mask.T.copy()
+        self.stacked = bool(renderer.stacked_mask.any())
+
+    @staticmethod
+    def composite(
+        layers: list["Layer"],
+        color: Optional[tuple[int, int, int, int]] = None,
+        size: Optional[tuple[int, int]] = None,
+    ) -> Image.Image:
+        """
+        Depth-composites layers in order, in the same way the renderer
+        draws models one after another into the same output.
+        Exact unless a layer is :attr:`stacked`: only the last pixel drawn
+        by each part is kept, so a translucent pixel it drew over can't show
+        through where another part hides the last one. Such states are
+        rendered directly instead (see :meth:`Joiner.render_views`).
+
+        Parameters
+        ----------
+        layers
+            The layers to composite, in the order of the block state file.
+        color
+            An optional tuple of (r, g, b, a) specifying the block color (colormap).
+        size
+            The tile size of the layers' projection, by default :attr:`Renderer.size`.
+
+        Returns
+        -------
+        Image.Image
+            The composited image.
+        """
+        width, height = size if size is not None else Renderer.Renderer.size
+        output = np.zeros((height, width, 4), dtype=np.uint8)
+        # Kept as float64 since the renderer compares unrounded depths
+        # against the float32 depth buffer, and ties matter for coplanar parts
+        depth = np.full((height, width), -1, dtype=np.float64)
+        for layer in layers:
+            pixels = layer.pixels
+            if color is not None and layer.tinted.any():
+                # Same as int(pixel * color / 255) in the renderer
+                pixels = pixels.copy()
+                tinted = pixels[layer.tinted].astype(np.uint32)
+                pixels[layer.tinted] = tinted * np.array(color, dtype=np.uint32) // 255
+
+            # Translucent pixels are drawn but don't write to depth
+            drawn = (layer.pixels[:, :, 3] != 0) & (layer.depth > depth)
+            output[drawn] = pixels[drawn]
+            np.maximum(depth, layer.opaque_depth, out=depth)
+        return Image.fromarray(output)
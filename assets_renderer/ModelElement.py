@@ -12,7 +12,8 @@ class ModelElement:
         self.model_parser = model_parser
         self.start = element["from"]
         self.end = element["to"]
-        self.faces = element["faces"]
+        # Copied, since textures are resolved in place and elements are shared
+        self.faces = {direction: dict(face) for direction, face in element["faces"].items()}
         if "rotation" in element:
             self.rotation = element["rotation"]
         else:
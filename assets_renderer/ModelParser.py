@@ -1,6 +1,7 @@
 from Parser import Parser
 import ParserCollection
 from ModelElement import ModelElement
+from Instrumentation import instrumentation
 from typing import Optional
 
 
@@ -39,15 +40,29 @@ class ModelParser(Parser):
         self.collection = collection
 
     def parse(self) -> None:
+        instrumentation.count("model_parses")
         self.load()
         if "parent" in self.properties and isinstance(self.properties["parent"], str):
             name = self.properties["parent"]
-            if name not in self.collection.models:
+            if name not in self.collection:
                 self.collection.add(name)
             self.parent = self.collection.get(name)
         else:
             self.parent = None
 
+        # Identical elements and faces are shared with other models
+        elements = self.properties.get("elements")
+        if isinstance(elements, list):
+            self.properties["elements"] = [
+                self.collection.intern({
+                    **element,
+                    "faces": {direction: self.collection.intern(face) for direction, face in element["faces"].items()},
+                })
+                if isinstance(element, dict) and isinstance(element.get("faces"), dict)
+                else element
+                for element in elements
+            ]
+
         self.parsed = True
 
     def get_elements(self, top_class: "ModelParser") -> list[ModelElement]:
@@ -66,7 +81,9 @@ class ModelParser(Parser):
         list
             A list of :class:`~.ModelElement`s for the model.
         """
-        self.load()
+        # Loaded once, elements aren't changed
+        if self.source is None:
+            self.load()
         if "elements" in self.properties:
             elements = self.properties["elements"]
             if isinstance(elements, list):
@@ -0,0 +1,189 @@
+import Renderer
+from RasterBackend import RasterBackend
+from PythonBackend import PythonBackend
+from Instrumentation import instrumentation
+
+import numpy as np
+import numpy.typing as npt
+
+from math import floor
+from PIL import Image
+from typing import Optional
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _kernel(
+    width, height, texture_size,
+    lines, flags, depths, uvs, rotations, tints, texture_ids,
+    texels, offsets, texture_widths, texture_heights,
+    color, output, depth_buffer, pixel_depth, tint_mask, translucent_mask, stacked_mask,
+):
+    # Same steps and the same float operations as PythonBackend.rasterize,
+    # on arrays. Faces are rows of:
+    # lines: slope_x, slope_y, p1_x_intercept, p1_y_intercept, p2_x_intercept, p2_y_intercept
+    # flags: slope_x exists, slope_y exists, uv is float32
+    # depths: z of each corner (float32), uvs: u, v, s, t
+    depth_rejections = 0
+    texel_fetches = 0
+    for x in range(width):
+        for y in range(height):
+            for i in range(lines.shape[0]):
+                slope_x, slope_y = lines[i, 0], lines[i, 1]
+                p1_x_intercept, p1_y_intercept = lines[i, 2], lines[i, 3]
+                p2_x_intercept, p2_y_intercept = lines[i, 4], lines[i, 5]
+                x_middle, y_middle = x + 0.5001, y + 0.5001
+
+                # 2a:
+                x_intercept = y_middle - slope_x * x_middle if flags[i, 0] else x_middle
+                texture_x = (x_intercept - p1_x_intercept) / (p2_x_intercept - p1_x_intercept)
+                if not 0 <= texture_x < 1:
+                    continue
+                y_intercept = y_middle - slope_y * x_middle if flags[i, 1] else x_middle
+                texture_y = (y_intercept - p1_y_intercept) / (p2_y_intercept - p1_y_intercept)
+                if not 0 <= texture_y < 1:
+                    continue
+
+                # 2b: differences of float32 corners stay float32, like numpy scalars
+                z1 = depths[i, 0] + (depths[i, 1] - depths[i, 0]) * texture_y
+                z2 = depths[i, 3] + (depths[i, 2] - depths[i, 3]) * texture_y
+                z = z1 + (z2 - z1) * texture_x
+                if z <= depth_buffer[x, y]:
+                    depth_rejections += 1
+                    continue
+
+                # 2c:
+                rotation = rotations[i]
+                if rotation == 90:
+                    texture_x, texture_y = texture_y, 1 - texture_x
+                elif rotation == 180:
+                    texture_x, texture_y = 1 - texture_x, 1 - texture_y
+                elif rotation == 270:
+                    texture_x, texture_y = 1 - texture_y, texture_x
+
+                # 2d:
+                u, v, s, t = uvs[i, 0], uvs[i, 1], uvs[i, 2], uvs[i, 3]
+                if flags[i, 2]:
+                    du = np.float32(s) - np.float32(u)
+                    dv = np.float32(t) - np.float32(v)
+                else:
+                    du = s - u
+                    dv = t - v
+                texture = texture_ids[i]
+                image_width = texture_widths[texture]
+                texture_x_pixels = min(floor((u + du * texture_x) / texture_size * image_width), image_width - 1)
+                texture_y_pixels = min(floor((v + dv * texture_y) / texture_size * image_width), image_width - 1)
+                if texture_y_pixels >= texture_heights[texture]:
+                    raise IndexError("image index out of range")
+
+                # 2e:
+                texel_fetches += 1
+                texel = offsets[texture] + texture_y_pixels * image_width + texture_x_pixels
+                alpha = texels[texel, 3]
+                if alpha != 0:
+                    if alpha == 255:
+                        depth_buffer[x, y] = z
+                    pixel_depth[x, y] = z
+                    tint_mask[x, y] = tints[i]
+                    if translucent_mask[x, y]:
+                        stacked_mask[x, y] = True
+                    translucent_mask[x, y] = alpha != 255
+                    for channel in range(4):
+                        value = texels[texel, channel]
+                        if tints[i] and color[channel] >= 0:
+                            value = int(value * color[channel] / 255)
+                        output[y, x, channel] = value
+    return depth_rejections, texel_fetches
+
+
+if numba is not None:
+    # No fastmath, it would change rounding
+    _kernel = numba.njit(cache=True)(_kernel)
+
+
+class NumbaBackend(RasterBackend):
+    """
+    The reference loop compiled with Numba, when it's installed.
+    Faces and textures are packed into arrays first, and renders
+    recording a :class:`~.TexelMap` go to the :class:`~.PythonBackend`.
+    """
+
+    name = "numba"
+
+    reference: PythonBackend
+    arrays: dict[str, tuple[Image.Image, npt.NDArray[np.uint8]]]  # textures as flat rgba
+
+    def __init__(self) -> None:
+        """
+        Raises
+        ------
+        :exc:`ValueError`
+            If Numba isn't installed.
+        """
+        if numba is None:
+            raise ValueError("The numba rasterizer backend needs Numba installed.")
+        self.reference = PythonBackend()
+        self.arrays = {}
+
+    def texture_array(self, renderer: "Renderer.Renderer", texture: str) -> npt.NDArray[np.uint8]:
+        image = renderer.textures.get(texture)
+        # The image is part of the key, since texture caches can be invalidated
+        if texture not in self.arrays or self.arrays[texture][0] is not image:
+            self.arrays[texture] = (image, np.asarray(image, dtype=np.uint8).reshape(-1, 4))
+        return self.arrays[texture][1]
+
+    def rasterize(
+        self,
+        renderer: "Renderer.Renderer",
+        faces: list["Renderer.ProcessedFace"],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> None:
+        if renderer.texel_map is not None:
+            self.reference.rasterize(renderer, faces, color)
+            return
+
+        for face in faces:
+            if face.rotation not in {0, 90, 180, 270}:
+                raise ValueError(f"Texture rotation {face.rotation} not in 0, 90, 180, 270.")
+
+        names = list(dict.fromkeys(face.texture for face in faces))
+        arrays = [self.texture_array(renderer, name) for name in names]
+        images = [renderer.textures.get(name) for name in names]
+        texels = np.concatenate(arrays) if arrays else np.zeros((0, 4), dtype=np.uint8)
+        offsets = np.cumsum([0] + [len(array) for array in arrays[:-1]], dtype=np.int64)
+
+        count = len(faces)
+        lines = np.zeros((count, 6), dtype=np.float64)
+        flags = np.zeros((count, 3), dtype=np.bool_)
+        depths = np.zeros((count, 4), dtype=np.float32)
+        uvs = np.zeros((count, 4), dtype=np.float64)
+        for i, face in enumerate(faces):
+            slope_x, slope_y = face.slopes
+            lines[i] = (slope_x or 0, slope_y or 0, *face.intercepts[:2], *face.intercepts[2:])
+            flags[i] = (slope_x is not None, slope_y is not None, np.asarray(face.uv).dtype == np.float32)
+            depths[i] = face.face_3D[:, 2]
+            uvs[i] = face.uv
+
+        output = np.array(renderer.output, dtype=np.uint8)
+        depth_rejections, texel_fetches = _kernel(
+            renderer.size[0], renderer.size[1], Renderer.TEXTURE_SIZE,
+            lines, flags, depths, uvs,
+            np.array([face.rotation for face in faces], dtype=np.int64),
+            np.array([face.color for face in faces], dtype=np.bool_),
+            np.array([names.index(face.texture) for face in faces], dtype=np.int64),
+            texels,
+            offsets,
+            np.array([image.width for image in images], dtype=np.int64),
+            np.array([image.height for image in images], dtype=np.int64),
+            np.array(color if color is not None else (-1, -1, -1, -1), dtype=np.int64),
+            output, renderer.depth_buffer, renderer.pixel_depth, renderer.tint_mask,
+            renderer.translucent_mask, renderer.stacked_mask,
+        )
+        renderer.output = Image.fromarray(output, "RGBA")
+
+        if instrumentation.enabled:
+            instrumentation.count("depth_rejections", depth_rejections)
+            instrumentation.count("texel_fetches", texel_fetches)
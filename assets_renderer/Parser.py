@@ -1,5 +1,6 @@
 import json
 from abc import abstractmethod
+from typing import Optional
 
 
 class Parser:
@@ -10,20 +11,26 @@ class Parser:
     file: str
     properties: dict[str, int|str|list|dict|bool]
     parsed: bool
+    source: Optional[str]  # file contents, read once
 
     def __init__(self, file: str):
         self.file = file
+        self.source = None
 
     def load(self) -> None:
         """
-        Opens the file and reads it, setting :attr:`properties`
+        Opens the file and reads it, setting :attr:`properties`.
+        The file is only read the first time, and later calls
+        decode a fresh copy of the same contents.
 
         Returns
         -------
         None
         """
-        with open(self.file) as file:
-            self.properties = json.load(file)
+        if self.source is None:
+            with open(self.file) as file:
+                self.source = file.read()
+        self.properties = json.loads(self.source)
 
     @abstractmethod
     def parse(self) -> None:
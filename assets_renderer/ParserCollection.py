@@ -1,17 +1,99 @@
 import ModelParser
-from os.path import join
+import json
+from concurrent.futures import Executor
+from os.path import exists, join
+from typing import Iterable, Sequence
 
 class ParserCollection:
     """
     A collection of parsers, used for models with hierarchy (a `parent` attribute).
+    Can be shared by joiners of different namespaces, so that models
+    (and the parents they have in common) are only parsed once.
+    Models are stored by namespaced identifier, and identical elements
+    and faces of different models are stored once (see :meth:`intern`).
     """
 
-    models: dict[str, "ModelParser.ModelParser"]
+    models: dict[str, "ModelParser.ModelParser"]  # by namespaced identifier
     root: str
-    def __init__(self, root, branch) -> None:
+    branch: str
+    overlays: Sequence[str]
+    interned: dict[str, dict]  # by json
+
+    def __init__(self, root: str, branch: str, overlays: Sequence[str] = ()) -> None:
+        """
+        Parameters
+        ----------
+        root
+            The assets root, containing one folder for each namespace.
+        branch
+            The folder of the parsed files in each namespace, such as `models`.
+        overlays
+            Namespaces whose files replace vanilla (`minecraft`) ones
+            with the same path, first one first, like resource packs.
+        """
         self.models = {}
         self.root = root
         self.branch = branch
+        self.overlays = overlays
+        self.interned = {}
+
+    @staticmethod
+    def identifier(model: str) -> str:
+        """
+        Get the namespaced identifier of a model.
+
+        Parameters
+        ----------
+        model
+            The model, as an identifier name, with or without a namespace.
+
+        Returns
+        -------
+        str
+            The identifier, such as `minecraft:block/cube`.
+        """
+        return model if ":" in model else f"minecraft:{model}"
+
+    def __contains__(self, model: str) -> bool:
+        return self.identifier(model) in self.models
+
+    def intern(self, value: dict) -> dict:
+        """
+        Get the stored copy of a json object, storing it the first time.
+        Interned objects are shared, so they must not be changed.
+
+        Parameters
+        ----------
+        value
+            The json object, such as a model element.
+
+        Returns
+        -------
+        dict
+            An equal object, the same one for every equal value.
+        """
+        return self.interned.setdefault(json.dumps(value, sort_keys=True), value)
+
+    def prune(self) -> None:
+        """
+        Forget interned objects that no model in the collection uses anymore,
+        after models were removed (see :meth:`Joiner.invalidate`).
+
+        Returns
+        -------
+        None
+        """
+        # Rebuilt from the models left, which hold the only other references
+        self.interned = {}
+        for parser in self.models.values():
+            elements = parser.properties.get("elements")
+            if not isinstance(elements, list):
+                continue
+            for element in elements:
+                if isinstance(element, dict) and isinstance(element.get("faces"), dict):
+                    for face in element["faces"].values():
+                        self.intern(face)
+                    self.intern(element)
 
     def add(self, model: str) -> None:
         """
@@ -26,13 +108,86 @@ class ParserCollection:
         -------
         None
         """
-        if ":" in model:
-            namespace, rest = model.split(":")
-        else:
-            namespace, rest = "minecraft", model
-        parser = ModelParser.ModelParser(join(self.root, namespace, self.branch, f"{rest}.json"), self)
+        parser = ModelParser.ModelParser(self.path(model), self)
         parser.parse()
-        self.models[model] = parser
+        self.models[self.identifier(model)] = parser
+
+    def path(self, model: str) -> str:
+        """
+        Get the file name of a model.
+
+        Parameters
+        ----------
+        model
+            The model, as an identifier name.
+
+        Returns
+        -------
+        str
+            The path of the model json, in the first overlay that has it
+            for vanilla models.
+        """
+        namespace, rest = self.identifier(model).split(":")
+        if namespace == "minecraft":
+            for overlay in self.overlays:
+                path = join(self.root, overlay, self.branch, f"{rest}.json")
+                if exists(path):
+                    return path
+        return join(self.root, namespace, self.branch, f"{rest}.json")
+
+    def preload(self, models: Iterable[str], executor: Executor) -> None:
+        """
+        Add models and all of their parents to the collection, reading
+        the files concurrently one level of the hierarchy at a time.
+        Models that can't be read are left out, and raise when added normally.
+
+        Parameters
+        ----------
+        models
+            The models to add, as identifier names.
+        executor
+            The executor to read files on.
+
+        Returns
+        -------
+        None
+        """
+        def read(parser: "ModelParser.ModelParser") -> bool:
+            try:
+                parser.load()
+            except (OSError, ValueError):
+                return False
+            return True
+
+        loaded: dict[str, ModelParser.ModelParser] = {}
+        pending = {self.identifier(model) for model in models if model not in self}
+        while pending:
+            parsers = {model: ModelParser.ModelParser(self.path(model), self) for model in pending}
+            pending = set()
+            for (model, parser), success in zip(parsers.items(), executor.map(read, parsers.values())):
+                if not success:
+                    continue
+                loaded[model] = parser
+                parent = parser.properties.get("parent")
+                if isinstance(parent, str):
+                    parent = self.identifier(parent)
+                    if parent not in self.models and parent not in loaded and parent not in parsers:
+                        pending.add(parent)
+
+        # Parents go first, so that parsing doesn't read them again
+        def register(model: str) -> None:
+            if model in self.models or model not in loaded:
+                return
+            parent = loaded[model].properties.get("parent")
+            if isinstance(parent, str):
+                register(self.identifier(parent))
+                if parent not in self:
+                    return
+            loaded[model].parse()
+            self.models[model] = loaded[model]
+
+        for model in loaded:
+            register(model)
 
     def get(self, model: str) -> "ModelParser.ModelParser":
         """
@@ -48,4 +203,4 @@ class ParserCollection:
         :class:`~.ModelParser`
             The model parser requested.
         """
-        return self.models[model]
\ No newline at end of file
+        return self.models[self.identifier(model)]
\ No newline at end of file
@@ -0,0 +1,111 @@
+from Joiner import Joiner
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+
+class Pipeline:
+    """
+    Renders every atlas planned by :meth:`Joiner.parse_state` (see
+    :attr:`Joiner.plan_only`) in three overlapping stages: block state
+    files, models and textures of the next atlases are read on one thread
+    (see :meth:`Joiner.prefetch`), the current atlas is rendered on the
+    calling thread, and finished atlases are compressed and saved on
+    another (see :attr:`Joiner.encoder`). Png compression and file reads
+    mostly release the GIL, so they're hidden behind rendering.
+
+    Both queues are bounded, so that a slow stage holds up the others
+    instead of keeping every atlas in memory.
+    """
+
+    joiners: list[Joiner]
+    ahead: int
+    queued: int
+    pending: deque[Future]  # saves not done yet, oldest first
+
+    def __init__(self, joiners: list[Joiner], ahead: int = 1, queued: int = 2) -> None:
+        """
+        Parameters
+        ----------
+        joiners
+            The joiners, with their atlases planned.
+        ahead
+            Number of atlases read ahead of the one being rendered.
+        queued
+            Maximum number of rendered atlases waiting to be saved.
+        """
+        self.joiners = joiners
+        self.ahead = ahead
+        self.queued = queued
+        self.pending = deque()
+
+    def encode(self, executor: ThreadPoolExecutor, save: Callable[[], None]) -> None:
+        """
+        Queue the save of a rendered atlas, used as :attr:`Joiner.encoder`.
+        Waits for the oldest save when :attr:`queued` saves are pending,
+        which also raises if that save failed.
+
+        Parameters
+        ----------
+        executor
+            The executor saving the atlases.
+        save
+            Compresses and saves the atlas.
+
+        Returns
+        -------
+        None
+        """
+        while len(self.pending) >= self.queued:
+            self.pending.popleft().result()
+        self.pending.append(executor.submit(save))
+
+    @staticmethod
+    def read(joiner: Joiner, files: list[str]) -> None:
+        """
+        Read the block state files, models and textures of an atlas ahead
+        of rendering it (see :meth:`Joiner.prefetch`). Merged builds don't
+        read assets, so nothing is read for them.
+
+        Parameters
+        ----------
+        joiner
+            The joiner of the atlas.
+        files
+            The block state files of the atlas.
+
+        Returns
+        -------
+        None
+        """
+        if not joiner.merge:
+            joiner.prefetch(files)
+
+    def run(self) -> None:
+        """
+        Render and save every planned atlas of every joiner, in the order they were planned.
+
+        Returns
+        -------
+        None
+        """
+        atlases = [(joiner, output) for joiner in self.joiners for output in joiner.atlases]
+        with ThreadPoolExecutor(1) as reader, ThreadPoolExecutor(1) as encoder:
+            reads: list[Future] = []
+            for joiner in self.joiners:
+                joiner.encoder = lambda save: self.encode(encoder, save)
+            try:
+                for i, (joiner, output) in enumerate(atlases):
+                    while len(reads) < min(i + 1 + self.ahead, len(atlases)):
+                        next_joiner, next_output = atlases[len(reads)]
+                        files = next_joiner.atlases[next_output][0]
+                        reads.append(reader.submit(self.read, next_joiner, files))
+                    # Not read twice at the same time
+                    reads[i].result()
+                    joiner.rebuild(output)
+                while self.pending:
+                    self.pending.popleft().result()
+            finally:
+                for joiner in self.joiners:
+                    joiner.encoder = None
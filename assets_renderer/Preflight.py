@@ -0,0 +1,140 @@
+from Joiner import Joiner
+from Renderer import Renderer
+
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+# Joiners of the running preflight, for worker processes. Forked workers
+# inherit them, since parse_state arguments (like key lambdas) can't be pickled.
+_joiners: list[Joiner] = []
+
+
+def _check(job: tuple[int, str]) -> list[str]:
+    index, output = job
+    return Preflight.check_atlas(_joiners[index], output)
+
+
+class Preflight:
+    """
+    Checks every atlas planned by :meth:`Joiner.parse_state` (see
+    :attr:`Joiner.plan_only`) for everything that would make rendering
+    raise: wrong keys orders and constraints, block state files and
+    models that are missing or malformed, missing textures, invalid
+    element and texture rotations, and uvlock on faces that aren't axis
+    aligned. Faces are processed like the renderer does, without drawing them,
+    so a full check takes seconds instead of a full build.
+    """
+
+    joiners: list[Joiner]
+    workers: Optional[int]
+
+    def __init__(self, joiners: list[Joiner], workers: Optional[int] = None) -> None:
+        """
+        Parameters
+        ----------
+        joiners
+            The joiners, with their atlases planned.
+        workers
+            Maximum number of worker processes, by default the number of CPUs.
+        """
+        self.joiners = joiners
+        self.workers = workers
+
+    @staticmethod
+    def check_atlas(joiner: Joiner, output: str) -> list[str]:
+        """
+        Check one atlas.
+
+        Parameters
+        ----------
+        joiner
+            The joiner the atlas was planned with.
+        output
+            The output file name of the atlas.
+
+        Returns
+        -------
+        list
+            A description of each problem. States with the same problem
+            are reported once, with the first state and a count.
+        """
+        files, keys_order, kwargs = joiner.atlases[output]
+        key, constraints, color = kwargs["key"], kwargs["constraints"], kwargs["color"]
+        try:
+            values, _, _ = joiner.get_layout(files, keys_order, kwargs["custom_values"], key, constraints)
+        except Exception as e:
+            return [f"{output}: {type(e).__name__}: {e}"]
+
+        problems: dict[str, tuple[str, int]] = {}  # problem -> first state, count
+        checked: dict[tuple, Optional[str]] = {}  # models by transform -> problem
+
+        def check_model(model: dict) -> Optional[str]:
+            transform = {
+                "x": model.get("x", 0),
+                "y": model.get("y", 0),
+                "z": model.get("z", 0),
+                "uv_lock": model.get("uvlock", False),
+            }
+            try:
+                if model["model"] not in joiner.parser_collection:
+                    joiner.parser_collection.add(model["model"])
+                r = Renderer(joiner.textures)
+                prepared = r.prepare(joiner.parser_collection.get(model["model"]), **transform)
+                for faces in r.process_faces(*prepared):
+                    for face in faces:
+                        if face.rotation not in {0, 90, 180, 270}:
+                            return f"{model['model']}: Texture rotation {face.rotation} not in 0, 90, 180, 270."
+            except Exception as e:
+                return f"{model.get('model')}: {type(e).__name__}: {e}"
+            return None
+
+        for file in files:
+            try:
+                state_parser = joiner.get_state_parser(file)
+            except Exception as e:
+                problems.setdefault(f"{file}: {type(e).__name__}: {e}", ("", 0))
+                continue
+            for state_dict in joiner.enumerate_states(values, key, constraints):
+                found = []
+                try:
+                    if color is not None:
+                        color(state_dict)
+                    for model in joiner.get_state(state_parser, state_dict):
+                        model_key = (str(model.get("model")), *(model.get(k) for k in ["x", "y", "z", "uvlock"]))
+                        if model_key not in checked:
+                            checked[model_key] = check_model(model)
+                        if checked[model_key] is not None:
+                            found.append(checked[model_key])
+                except Exception as e:
+                    found.append(f"{type(e).__name__}: {e}")
+                for problem in found:
+                    message = f"{file}: {problem}"
+                    first, count = problems.get(message, (str(state_dict), 0))
+                    problems[message] = (first, count + 1)
+
+        return [
+            f"{output}: {message}" + (f" (in {count} states, first {first})" if count else "")
+            for message, (first, count) in problems.items()
+        ]
+
+    def executor(self) -> Executor:
+        # Forked processes get the planned atlases for free, elsewhere use threads
+        if "fork" in multiprocessing.get_all_start_methods():
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+        return ThreadPoolExecutor(self.workers)
+
+    def run(self) -> list[str]:
+        """
+        Check every planned atlas of every joiner in parallel.
+
+        Returns
+        -------
+        list
+            A description of each problem, in the order atlases were planned.
+        """
+        global _joiners
+        _joiners = self.joiners
+        jobs = [(i, output) for i, joiner in enumerate(self.joiners) for output in joiner.atlases]
+        with self.executor() as executor:
+            return [problem for problems in executor.map(_check, jobs) for problem in problems]
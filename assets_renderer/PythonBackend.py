@@ -0,0 +1,194 @@
+import Renderer
+from RasterBackend import RasterBackend
+from Instrumentation import instrumentation
+
+import numpy.typing as npt
+import numpy as np
+
+from math import floor
+from PIL import Image
+from typing import Optional
+
+
+def interpolate(a: int | float, b: int | float, /, alpha: float) -> float:
+    """
+    Linear interpolation between 2 values.
+
+    Parameters
+    ----------
+    a
+        First value.
+    b
+        Second value.
+    alpha
+        Float within [0, 1] specifying the interpolation.
+
+    Returns
+    -------
+    float
+        The interpolated value
+    """
+    return a + (b - a) * alpha
+
+
+class PythonBackend(RasterBackend):
+    """
+    The reference rasterizer, a plain Python loop over pixels and faces.
+    Other backends must give exactly the same output.
+    Supports recording a :class:`~.TexelMap`.
+    """
+
+    name = "python"
+
+    def rasterize(
+        self,
+        renderer: "Renderer.Renderer",
+        faces: list["Renderer.ProcessedFace"],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> None:
+        # Comments marked below to show locations.
+        # How RSM Renderer works:
+        # 1. Pre-process each face so this thing runs faster, see :meth:`Renderer.process_faces`
+        # 2. Draw each pixel
+        #   Loop through each pixel
+        #   In each pixel, loop through the stored data
+        #   For each model element in the data, loop through its faces
+        #   a. Calculate intercepts, see 1g.
+        #   b. Check depth buffer to see if pixel is the closest.
+        #   c. Check if texture is mirrored. If it is, then the `floor`
+        #      operation on the texture pixel coordinates will misalign
+        #      the texture since it's going the reverse way. To fix that,
+        #      a very small amount must be subtracted from the coordinates.
+        #   d. Get coordinates
+        #   e. Draw pixel. If the alpha channel is 255, set depth buffer.
+
+        TEXTURE_SIZE = Renderer.TEXTURE_SIZE
+        depth_buffer, pixel_depth, tint_mask = renderer.depth_buffer, renderer.pixel_depth, renderer.tint_mask
+        translucent_mask, stacked_mask = renderer.translucent_mask, renderer.stacked_mask
+        output = renderer.output
+        texture_cache: dict[str, Image.Image] = {
+            face.texture: renderer.textures.get(face.texture)
+            for face in faces
+        }
+        recording = renderer.texel_map is not None
+        if renderer.texel_map is not None:
+            fragments = {id(face): renderer.texel_map.add_face(face.texture, face.color) for face in faces}
+
+        # Counted in locals and only reported at the end, since
+        # instrumentation is usually off
+        depth_rejections = texel_fetches = 0
+
+
+        # x and y are horizontal and vertical
+        # As a result, indexing is [y][x] since it goes [vertical][horizontal]
+        for x in range(renderer.size[0]):
+            for y in range(renderer.size[1]):
+                for face_processed in faces:
+                    slope_x, slope_y = face_processed.slopes
+                    p1_x_intercept, p1_y_intercept, p2_x_intercept, p2_y_intercept = face_processed.intercepts
+                    x_middle, y_middle = x + 0.5001, y + 0.5001
+
+                    # 2a:
+                    # Possibility of divide by 0 checked above
+                    x_intercept = y_middle - slope_x * (x_middle) if slope_x is not None else x_middle
+                    texture_x = (x_intercept - p1_x_intercept) / (p2_x_intercept - p1_x_intercept)
+                    if not 0 <= texture_x < 1:
+                        continue
+
+                    y_intercept = y_middle - slope_y * (x_middle) if slope_y is not None else x_middle
+                    texture_y = (y_intercept - p1_y_intercept) / (p2_y_intercept - p1_y_intercept)
+                    if not 0 <= texture_y < 1:
+                        continue
+
+                    face_3D: npt.NDArray[np.float32] = face_processed.face_3D
+
+                    # 2b:
+                    z1 = interpolate(face_3D[0, 2], face_3D[1, 2], texture_y)
+                    z2 = interpolate(face_3D[3, 2], face_3D[2, 2], texture_y)
+                    z = interpolate(z1, z2, texture_x)
+
+                    # When recording, hidden fragments are kept for the texel map,
+                    # so the depth test waits until the texture coordinates are known
+                    hidden = False
+                    if z <= depth_buffer[x, y]:
+                        depth_rejections += 1
+                        if not recording:
+                            continue
+                        hidden = True
+
+                    image = texture_cache[face_processed.texture]
+
+                    # 2c:
+                    x_inv = p1_x_intercept > p2_x_intercept
+                    y_inv = p1_y_intercept > p2_y_intercept
+
+                    # Searching textures shows rotation can only be
+                    # 0, 90, 180, or 270 (rarely 0)
+                    match face_processed.rotation:
+                        case 0:
+                            pass
+                        case 90:
+                            texture_x, texture_y = texture_y, 1 - texture_x
+                            y_inv = not y_inv
+                        case 180:
+                            texture_x, texture_y = 1 - texture_x, 1 - texture_y
+                            x_inv = not x_inv
+                            y_inv = not y_inv
+                        case 270:
+                            texture_x, texture_y = 1 - texture_y, texture_x
+                            x_inv = not x_inv
+                        case other:
+                            raise ValueError(
+                                f"Texture rotation {other} not in 0, 90, 180, 270."
+                            )
+
+                    # 2d:
+                    u, v, s, t = face_processed.uv
+
+                    texture_x_pixels = min(
+                        floor(interpolate(u, s, texture_x) / TEXTURE_SIZE * image.width),
+                        image.width - 1,
+                    )
+
+                    # For animated textures, only get first frame
+                    # (other frames are drawn from the texel map)
+                    # For liquid textures, cut in half (not implemented)
+                    texture_y_pixels = min(
+                        floor(interpolate(v, t, texture_y) / TEXTURE_SIZE * image.width),
+                        image.width - 1,
+                    )
+
+                    if recording:
+                        fragments[id(face_processed)].append((x, y, texture_x_pixels, texture_y_pixels, z))
+                        if hidden:
+                            continue
+
+                    # 2e:
+                    texel_fetches += 1
+                    pixel = image.getpixel((texture_x_pixels, texture_y_pixels))
+                    if isinstance(pixel, tuple) and pixel[3] != 0:
+                        if pixel[3] == 255:
+                            # No depth buffer writing if translucent pixel
+                            depth_buffer[x, y] = z
+                        pixel_depth[x, y] = z
+                        tint_mask[x, y] = face_processed.color
+                        if translucent_mask[x, y]:
+                            stacked_mask[x, y] = True
+                        translucent_mask[x, y] = pixel[3] != 255
+
+                        if face_processed.color and color is not None:
+                            pixel = (
+                                int(pixel[0] * color[0] / 255),
+                                int(pixel[1] * color[1] / 255),
+                                int(pixel[2] * color[2] / 255),
+                                int(pixel[3] * color[3] / 255),
+                            )
+                        output.putpixel((x, y), pixel)
+
+                    # Useful debugging things
+                    # output.putpixel((x, y), (texture_x_pixels * 255 // 16, texture_y_pixels * 255 // 16, 0, 255))
+                    # output.putpixel((x, y), (int(texture_x * 255), int(texture_y * 255), 0, 255))
+
+        if instrumentation.enabled:
+            instrumentation.count("depth_rejections", depth_rejections)
+            instrumentation.count("texel_fetches", texel_fetches)
@@ -0,0 +1,89 @@
+import Renderer
+
+from abc import abstractmethod
+from typing import Optional
+
+
+class RasterBackend:
+    """
+    Draws processed faces into a :class:`~.Renderer` (step 2 of rendering,
+    see :meth:`Renderer.raytrace`). :class:`~.PythonBackend` is the reference,
+    and every other backend must give pixel-identical output and buffers
+    (check with `compare_backends.py`).
+    """
+
+    name: str
+
+    @abstractmethod
+    def rasterize(
+        self,
+        renderer: "Renderer.Renderer",
+        faces: list["Renderer.ProcessedFace"],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> None:
+        """
+        Draw faces into the renderer's output, depth buffer, pixel depth
+        and tint mask, and record them to its texel map if it has one.
+
+        Parameters
+        ----------
+        renderer
+            The :class:`~.Renderer` to draw into.
+        faces
+            The faces to draw, in order.
+        color
+            A optional rgba tuple specifying the color (colormap).
+
+        Returns
+        -------
+        None
+        """
+        pass
+
+    @staticmethod
+    def available() -> list[str]:
+        """
+        Get the names of the backends that can be used here.
+
+        Returns
+        -------
+        list
+            The backend names, the reference first.
+        """
+        import NumbaBackend
+
+        return ["python"] + (["numba"] if NumbaBackend.numba is not None else [])
+
+    @staticmethod
+    def get(name: str = "python") -> "RasterBackend":
+        """
+        Make a backend by name.
+
+        Parameters
+        ----------
+        name
+            `python`, `numba`, or `auto` for the fastest available one.
+
+        Returns
+        -------
+        :class:`RasterBackend`
+            The backend.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the backend doesn't exist or can't be used here.
+        """
+        # Imported here, since backends import this module
+        from PythonBackend import PythonBackend
+        from NumbaBackend import NumbaBackend
+
+        if name == "auto":
+            name = RasterBackend.available()[-1]
+        match name:
+            case "python":
+                return PythonBackend()
+            case "numba":
+                return NumbaBackend()
+            case _:
+                raise ValueError(f"Unknown rasterizer backend {name}, expected one of python, numba, auto.")
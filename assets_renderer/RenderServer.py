@@ -0,0 +1,240 @@
+from Joiner import Joiner
+from ParserCollection import ParserCollection
+from TileCache import TileCache
+
+import argparse
+import io
+import json
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+class RenderServer(ThreadingHTTPServer):
+    """
+    A local HTTP server rendering single tiles on demand, for states
+    that aren't in the prebuilt atlases.
+    Parsers, models and textures stay loaded in the :class:`~.Joiner` of each
+    namespace, and rendered tiles are kept in a :class:`~.TileCache`.
+
+    Endpoints:
+    - `GET /render?file=repeater.json&state=delay=1,facing=north&namespace=minecraft&color=255,0,0,255`
+      returns the tile as a png. `state` uses the same format as
+      block state file variants, and `namespace` and `color` are optional.
+    - `GET /stats` returns the cache statistics as json.
+    """
+
+    root: str
+    namespaces: set[str]  # folders of the root, the only namespaces served
+    models: ParserCollection  # shared by the joiners of every namespace
+    joiners: dict[str, Joiner]
+    tiles: TileCache
+    render_lock: Lock
+    max_layers: int
+    max_families: int
+    prefetched: set[tuple[str, str]]
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        root: str,
+        *,
+        cache_bytes: int = 64 * 1024 * 1024,
+        max_layers: int = 4096,
+        max_families: int = 64,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        address
+            The (host, port) to listen on.
+        root
+            The assets root, containing one folder for each namespace.
+        cache_bytes
+            The maximum total size of cached png tiles.
+        max_layers
+            The maximum number of multipart layers, and of model shapes,
+            kept by each joiner before they are dropped.
+        max_families
+            The maximum number of shape families (see :meth:`Joiner.get_family`)
+            kept by each joiner before they are dropped. Each keeps a
+            :class:`~.TexelMap` of the whole tile, so they take much more memory than layers.
+        """
+        super().__init__(address, RenderRequestHandler)
+        self.root = root
+        self.namespaces = {name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))}
+        self.models = ParserCollection(root, "models", overlays=["custom"])
+        self.joiners = {}
+        self.tiles = TileCache(cache_bytes)
+        self.render_lock = Lock()
+        self.max_layers = max_layers
+        self.max_families = max_families
+        self.prefetched = set()
+
+    def render(
+        self,
+        namespace: str,
+        file: str,
+        state_dict: dict[str, str],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> bytes:
+        """
+        Render a tile, or get it from the cache.
+
+        Parameters
+        ----------
+        namespace
+            The namespace of the block state file.
+        file
+            The block state file name.
+        state_dict
+            A dictionary of block states.
+        color
+            An optional tuple of (r, g, b, a) specifying the block color (colormap).
+
+        Returns
+        -------
+        bytes
+            The tile as a png.
+        """
+        key = (namespace, file, tuple(sorted(state_dict.items())), color)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            return tile
+
+        # Joiners share mutable caches, so only one render at a time
+        with self.render_lock:
+            if namespace not in self.joiners:
+                self.joiners[namespace] = Joiner(self.root, namespace, "", parser_collection=self.models)
+            joiner = self.joiners[namespace]
+            if len(joiner.layers) > self.max_layers:
+                joiner.layers.clear()
+            if len(joiner.shapes) > self.max_layers:
+                joiner.shapes.clear()
+            if len(joiner.families) > self.max_families:
+                joiner.families.clear()
+            if (namespace, file) not in self.prefetched:
+                joiner.prefetch([file])
+                self.prefetched.add((namespace, file))
+            image = joiner.render_tile(joiner.get_state_parser(file), state_dict, color)
+
+        buffer = io.BytesIO()
+        image.save(buffer, "png")
+        tile = buffer.getvalue()
+        self.tiles.put(key, tile)
+        return tile
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for the :class:`~.RenderServer`.
+    """
+
+    server: RenderServer
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        match url.path:
+            case "/render":
+                try:
+                    namespace, file, state_dict, color = self.parse_query(query)
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                try:
+                    tile = self.server.render(namespace, file, state_dict, color)
+                except FileNotFoundError as e:
+                    self.send_error(404, f"Missing asset: {e.filename}")
+                    return
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, f"Invalid state: {e}")
+                    return
+                self.send(200, "image/png", tile)
+            case "/stats":
+                tiles = self.server.tiles
+                stats = {
+                    "tiles": len(tiles.tiles),
+                    "bytes": tiles.size,
+                    "hits": tiles.hits,
+                    "misses": tiles.misses,
+                }
+                self.send(200, "application/json", json.dumps(stats).encode())
+            case _:
+                self.send_error(404)
+
+    def parse_query(
+        self, query: dict[str, str]
+    ) -> tuple[str, str, dict[str, str], Optional[tuple[int, int, int, int]]]:
+        """
+        Parse and validate the query of a render request.
+
+        Parameters
+        ----------
+        query
+            The query parameters.
+
+        Returns
+        -------
+        tuple
+            The namespace, file name, dictionary of block states, and color.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If a parameter is missing or malformed, or the namespace isn't a folder of the root.
+        """
+        namespace = query.get("namespace", "minecraft")
+        file = query.get("file")
+        # Only namespaces of the root, no reading files outside the assets
+        # and no joiner for every name requested
+        if namespace not in self.server.namespaces:
+            raise ValueError(f"Invalid namespace: {namespace}")
+        if file is None or not re.fullmatch(r"[a-z0-9_.-]+\.json", file) or ".." in file:
+            raise ValueError(f"Invalid block state file: {file}")
+
+        state_dict = {}
+        if query.get("state", "") != "":
+            for state in query["state"].split(","):
+                if state.count("=") != 1:
+                    raise ValueError(f"Invalid state: {state}")
+                k, v = state.split("=")
+                state_dict[k] = v
+
+        color = None
+        if query.get("color", "") != "":
+            channels = query["color"].split(",")
+            if len(channels) not in {3, 4} or not all(c.isdigit() and int(c) < 256 for c in channels):
+                raise ValueError(f"Invalid color: {query['color']}")
+            r, g, b, a = (*map(int, channels), 255)[:4]
+            color = (r, g, b, a)
+        return namespace, file, state_dict, color
+
+    def send(self, code: int, content_type: str, body: bytes) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render RSM tiles on demand over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8642)
+    parser.add_argument("--root", default="assets_renderer/mcassets", help="The assets root.")
+    parser.add_argument("--cache-mb", type=int, default=64, help="Size of the tile cache, in MiB.")
+    args = parser.parse_args()
+
+    server = RenderServer((args.host, args.port), args.root, cache_bytes=args.cache_mb * 1024 * 1024)
+    print(f"Serving tiles on http://{args.host}:{args.port}/render", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,11 +1,13 @@
 from ModelParser import ModelParser
 from ModelElement import ModelElement
+from TextureCache import TextureCache
+from TexelMap import TexelMap
+import RasterBackend
+from Instrumentation import instrumentation
 
 import numpy as np
 import numpy.typing as npt
-import copy
 
-from math import floor
 from PIL import Image
 from typing import Optional, Sequence
 
@@ -22,6 +24,73 @@ from dataclasses import dataclass
 # The easiest way around this is to simply rotate the model element
 # around its center by 180 degrees.
 
+TEXTURE_SIZE = 16  # if one day Mojang changes this I'm going crazy
+
+
+# Just to make things easier to deal with
+@dataclass(slots=True)
+class ProcessedFace:
+    """
+    A face projected to the image, with everything needed to draw it.
+    """
+    face_name: str
+    uv: list[int]
+    texture: str
+    face_3D: npt.NDArray[np.float32]  # corners in view space (see Projection), / 16
+    face_2D: npt.NDArray[np.float32]  # corners in pixels
+    slopes: tuple[float, float]
+    intercepts: tuple[float, float, float, float]
+    rotation: float
+    color: bool
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    How a :class:`Renderer` projects blocks to its image. Corners are first
+    turned into view space, where x goes right, y goes up and z goes
+    towards the viewer (z is the depth), then `matrix` maps them to the
+    image (before flipping y), and `extent` of that fills the tile.
+    See :data:`PROJECTIONS`.
+    """
+    name: str
+    matrix: tuple[tuple[float, float], ...]  # view space -> image
+    extent: tuple[float, float]  # image size in blocks
+    scale: tuple[float, float] = (1, 1)  # tile size, relative to Renderer.size
+    view: Optional[tuple[tuple[int, int, int], ...]] = None  # block space -> view space, None for as is
+    offset: tuple[int, int, int] = (0, 0, 0)  # added after view
+
+    def size(self) -> tuple[int, int]:
+        """
+        Get the tile size, which follows :attr:`Renderer.size`.
+
+        Returns
+        -------
+        tuple
+            The width and height in pixels.
+        """
+        return round(Renderer.size[0] * self.scale[0]), round(Renderer.size[1] * self.scale[1])
+
+
+PROJECTIONS = {
+    projection.name: projection
+    for projection in [
+        # The RSM view: the south face, with the top squashed above it (z -> -1/2y)
+        Projection("oblique", ((1, 0), (0, 1), (0, -0.5)), (1, 1.5)),
+        # Orthographic, looking down with north up
+        Projection(
+            "top",
+            ((1, 0), (0, 1), (0, 0)),
+            (1, 1),
+            (1, 0.75),
+            view=((1, 0, 0), (0, 0, 1), (0, -1, 0)),
+            offset=(0, 1, 0),
+        ),
+        # Orthographic, looking at the south face
+        Projection("side", ((1, 0), (0, 1), (0, 0)), (1, 1), (1, 0.75)),
+    ]
+}
+
 
 class Renderer:
     """
@@ -31,7 +100,16 @@ class Renderer:
     """
 
     output: Image.Image
+    textures: TextureCache
     depth_buffer: npt.NDArray[np.float32]  # indexing not reversed ([x][y] not [y][x])
+    pixel_depth: npt.NDArray[np.float64]  # depth of the last drawn pixel, unrounded
+    tint_mask: npt.NDArray[np.bool_]  # whether the last drawn pixel is tinted
+    translucent_mask: npt.NDArray[np.bool_]  # whether the last drawn pixel is translucent
+    stacked_mask: npt.NDArray[np.bool_]  # whether a translucent pixel was drawn over, see Layer
+    texel_map: Optional[TexelMap]  # if set, every fragment is recorded to it
+    backend: "RasterBackend.RasterBackend"
+    projection: Projection
+    compiled: dict[tuple, list[ProcessedFace]]  # by model file and rotation, see compile
 
     directions = [
         "east",
@@ -41,13 +119,58 @@ class Renderer:
         "north",
         "south",
     ]
-    size = (72, 96)
+    size = (72, 96)  # of the oblique projection, each renderer has the size of its own
 
-    def __init__(self):
-        self.output = Image.new("RGBA", Renderer.size)
+    def __init__(
+        self,
+        textures: Optional[TextureCache] = None,
+        backend: "Optional[RasterBackend.RasterBackend]" = None,
+        projection: Optional[Projection] = None,
+    ):
+        """
+        Parameters
+        ----------
+        textures
+            A :class:`~.TextureCache` shared between renders.
+            By default, textures are loaded from the assets folder
+            for this renderer only.
+        backend
+            The :class:`~.RasterBackend` drawing the faces,
+            by default the reference :class:`~.PythonBackend`.
+        projection
+            The :class:`Projection` to draw with, by default oblique.
+        """
+        self.textures = textures if textures is not None else TextureCache("assets_renderer/mcassets")
+        self.projection = projection if projection is not None else PROJECTIONS["oblique"]
+        self.size = self.projection.size()
+        self.output = Image.new("RGBA", self.size)
         self.depth_buffer = np.full(
-            Renderer.size, -1, dtype=np.float32
+            self.size, -1, dtype=np.float32
         )  # as long as it's < 0
+        self.pixel_depth = np.full(self.size, -1, dtype=np.float64)
+        self.tint_mask = np.zeros(self.size, dtype=np.bool_)
+        self.translucent_mask = np.zeros(self.size, dtype=np.bool_)
+        self.stacked_mask = np.zeros(self.size, dtype=np.bool_)
+        self.texel_map = None
+        self.backend = backend if backend is not None else RasterBackend.RasterBackend.get()
+        self.compiled = {}
+
+    def clear(self) -> None:
+        """
+        Clear the output and buffers in place and stop recording, to render
+        another block with the same renderer instead of allocating a new one.
+
+        Returns
+        -------
+        None
+        """
+        self.output.paste((0, 0, 0, 0), (0, 0, *self.size))
+        self.depth_buffer.fill(-1)
+        self.pixel_depth.fill(-1)
+        self.tint_mask.fill(False)
+        self.translucent_mask.fill(False)
+        self.stacked_mask.fill(False)
+        self.texel_map = None
 
     def get_image(self) -> Image.Image:
         """
@@ -91,15 +214,144 @@ class Renderer:
             If true, compute uvs from the rotated textures
             instead of pre-rotated ones. From block state file.
         """
+        self.raytrace(*self.prepare(model, x=x, y=y, z=z, uv_lock=uv_lock), color)
+
+    def prepare(
+        self,
+        model: ModelParser,
+        *,
+        x=0,
+        y=0,
+        z=0,
+        uv_lock=False,
+    ) -> tuple[list[ModelElement], list[npt.NDArray[np.float32]], list[npt.NDArray[np.float32]]]:
+        """
+        Builds the faces of a model and rotates them, ready for :meth:`raytrace`.
+
+        Parameters
+        ----------
+        model
+            A :class:`~.ModelParser` to be rendered. From block state file.
+        x
+            Angle of rotation around the x axis, clockwise. From block state file.
+        y
+            Angle of rotation around the y axis, counter-clockwise. From block state file.
+        z
+            Angle of rotation around the z axis, clockwise. From block state file.
+        uv_lock
+            If true, compute uvs from the rotated textures
+            instead of pre-rotated ones. From block state file.
+
+        Returns
+        -------
+        tuple
+            The elements, the rotated faces of each element, and the uvlock faces.
+        """
         model.elements = model.get_elements(model)
         element_faces = [self.build_faces(element) for element in model.elements]
-        uv_locked_faces = element_faces if uv_lock else copy.deepcopy(element_faces)
+        # Faces before rotating, for inferring uvs. Arrays are copied on their
+        # own, since the rest is only read (see process_faces)
+        uv_locked_faces = element_faces if uv_lock else [faces.copy() for faces in element_faces]
         for element, faces in zip(model.elements, element_faces):
             self.rotate_element(element, faces)
             self.rotate_element_center(faces, "x", x)
             self.rotate_element_center(faces, "y", y)
             self.rotate_element_center(faces, "z", z)
-        self.raytrace(model.elements, element_faces, uv_locked_faces, color)
+        return model.elements, element_faces, uv_locked_faces
+
+    def compile(
+        self,
+        model: ModelParser,
+        *,
+        x=0,
+        y=0,
+        z=0,
+        uv_lock=False,
+    ) -> list[ProcessedFace]:
+        """
+        Prepares and processes the faces of a model, without the faces that
+        are hidden behind its opaque faces (see :meth:`cull_hidden`).
+        Kept for the next time the model is drawn with the same rotation,
+        so models changed since must go with a new renderer.
+        See :meth:`prepare` for the parameters.
+
+        Returns
+        -------
+        list
+            The faces to draw with :meth:`draw`.
+        """
+        key = (model.file, x, y, z, uv_lock)
+        if key not in self.compiled:
+            faces_processed = self.process_faces(*self.prepare(model, x=x, y=y, z=z, uv_lock=uv_lock))
+            self.compiled[key] = self.cull_hidden([face for faces in faces_processed for face in faces])
+        return self.compiled[key]
+
+    def cull_hidden(self, faces: list[ProcessedFace]) -> list[ProcessedFace]:
+        """
+        Drops the faces that can't change the image or buffers, since at
+        every pixel they cover another face is in front with an opaque
+        texel, whatever else is drawn. Faces that cover no pixel go too.
+
+        Faces are only treated as opaque in front if every texel of their
+        texture is opaque in every frame, so that texel maps replayed with
+        other frames stay the same. Depths are compared rounded like the
+        depth buffer, so a face is only hidden if it loses to it either way.
+        Cullface doesn't help here, since every block is drawn on its own.
+
+        Parameters
+        ----------
+        faces
+            The processed faces of a model.
+
+        Returns
+        -------
+        list
+            The faces left, in the same order.
+        """
+        if len(faces) < 2:
+            return faces
+        # Same float operations as PythonBackend.rasterize, for every pixel at once
+        x_middle = (np.arange(self.size[0]) + 0.5001)[:, None]
+        y_middle = (np.arange(self.size[1]) + 0.5001)[None, :]
+        depths = []
+        for face in faces:
+            slope_x, slope_y = face.slopes
+            p1_x_intercept, p1_y_intercept, p2_x_intercept, p2_y_intercept = face.intercepts
+            x_intercept = y_middle - slope_x * x_middle if slope_x is not None else x_middle
+            texture_x = (x_intercept - p1_x_intercept) / (p2_x_intercept - p1_x_intercept)
+            y_intercept = y_middle - slope_y * x_middle if slope_y is not None else x_middle
+            texture_y = (y_intercept - p1_y_intercept) / (p2_y_intercept - p1_y_intercept)
+            corners = face.face_3D[:, 2]
+            z1 = corners[0] + (corners[1] - corners[0]) * texture_y
+            z2 = corners[3] + (corners[2] - corners[3]) * texture_y
+            z = z1 + (z2 - z1) * texture_x
+            covered = (0 <= texture_x) & (texture_x < 1) & (0 <= texture_y) & (texture_y < 1)
+            # Rounded like the depth buffer, nothing covers -inf
+            depths.append(np.where(covered, z, -np.inf).astype(np.float32))
+
+        # The nearest and second nearest opaque face at each pixel,
+        # the second is what's in front of the nearest itself
+        occluders = [i for i, face in enumerate(faces) if self.textures.opaque(face.texture)]
+        nearest = np.full((2, *self.size), -np.inf, dtype=np.float32)
+        first = np.full(self.size, -1)
+        if occluders:
+            stack = np.stack([depths[i] for i in occluders])
+            index = stack.argmax(axis=0)[None]
+            nearest[0] = np.take_along_axis(stack, index, axis=0)[0]
+            np.put_along_axis(stack, index, -np.inf, axis=0)
+            nearest[1] = stack.max(axis=0)
+            first = np.array(occluders)[index[0]]
+
+        visible = []
+        for i, face in enumerate(faces):
+            covered = depths[i] != -np.inf
+            front = np.where(first == i, nearest[1], nearest[0])
+            if covered.any() and not np.all(front[covered] > depths[i][covered]):
+                visible.append(face)
+
+        if instrumentation.enabled:
+            instrumentation.count("faces_culled_hidden", len(faces) - len(visible))
+        return visible
 
     def build_faces(self, element: ModelElement) -> npt.NDArray[np.float32]:
         """
@@ -220,8 +472,9 @@ class Renderer:
             # negative direction of the axis.
             # Too confusing to implement 2 methods, so I'll just invert
             # x and y rotations to change one to the other.
+            # (Copied, since model elements are shared)
             if rotation["axis"] != "z":
-                rotation["angle"] *= -1
+                rotation = {**rotation, "angle": -rotation["angle"]}
             self.rotate_faces(faces, **rotation)
 
     def rotate_element_center(
@@ -243,31 +496,29 @@ class Renderer:
             CENTER = [8, 8, 8]
             self.rotate_faces(faces, CENTER, axis, angle)
 
-    # @profile
-    def raytrace(
+    def process_faces(
         self,
         elements: list[ModelElement],
         element_faces: list[npt.NDArray[np.float32]],
         uv_locked_faces: list[npt.NDArray[np.float32]],
-        color: Optional[tuple[int, int, int, int]] = None,
-    ) -> None:
+    ) -> list[list["ProcessedFace"]]:
         """
-        Renders the texture to :attr:`output`.
+        Pre-processes the faces of each element for :meth:`raytrace`,
+        projecting them to the image and dropping faces that can't be seen.
 
         Parameters
         ----------
         elements
             List of elements to render.
         element_faces
-            List of faces of each element, generated with :meth:`~.d_faces`.
+            List of faces of each element, generated with :meth:`~.build_faces`.
         uv_locked_faces
             Faces respecting uvlock, where the faces are not rotated if uv lock is on.
-        color
-            A optional rgba tuple specifying the color (colormap).
 
         Returns
         -------
-        None
+        list
+            A list of visible :class:`~.ProcessedFace` for each element.
 
         Raises
         ------
@@ -275,7 +526,6 @@ class Renderer:
             If uv was not present and rotation is not a multiple of 90 degrees,
             since inferring uvs (or uvlock) only works with a face parallel to
             one of the planes.
-            Or if the texture uv rotation is not a multiple of 90.
         """
         # Comments marked below to show locations.
         # How RSM Renderer works:
@@ -284,7 +534,9 @@ class Renderer:
         #   a. Use the face name to get its 3D model, / 16
         #   b. Turn the 3D model into a 2D one for the image
         #     Use a matrix multiplication (just looks cleaner) to do math,
-        #     where x -> x, y -> y, z -> -1/2y (z goes downwards vertically).
+        #     where x -> x, y -> y, z -> -1/2y (z goes downwards vertically)
+        #     for the oblique projection, after turning the model to the view
+        #     for others (see :class:`Projection`).
         #     Then, invert y-axis (images have +z going down), and multiply by
         #     image size to convert to pixel coordinates.
         #   c. Backface culling
@@ -305,59 +557,23 @@ class Renderer:
         #     the position of the point on the face.
         #     Vertical lines just use x-intercept instead of y-intercept.
         #   At the end, store the data
-        # 2. Draw each pixel
-        #   Loop through each pixel
-        #   In each pixel, loop through the stored data
-        #   For each model element in the data, loop through its faces
-        #   a. Calculate intercepts, see 1g.
-        #   b. Check depth buffer to see if pixel is the closest.
-        #   c. Check if texture is mirrored. If it is, then the `floor`
-        #      operation on the texture pixel coordinates will misalign
-        #      the texture since it's going the reverse way. To fix that,
-        #      a very small amount must be subtracted from the coordinates.
-        #   d. Get coordinates
-        #   e. Draw pixel. If the alpha channel is 255, set depth buffer.
-
-        # Just to make things easier to deal with
-        @dataclass
-        class ProcessedFace:
-            face_name: str
-            uv: list[int]
-            texture: str
-            face_3D: npt.NDArray[np.float32]
-            slopes: tuple[float, float]
-            intercepts: tuple[float, float, float, float]
-            rotation: float
-            color: bool
-
-        def interpolate(a: int | float, b: int | float, /, alpha: float) -> float:
-            """
-            Linear interpolation between 2 values.
-
-            Parameters
-            ----------
-            a
-                First value.
-            b
-                Second value.
-            alpha
-                Float within [0, 1] specifying the interpolation.
-
-            Returns
-            -------
-            float
-                The interpolated value
-            """
-            return a + (b - a) * alpha
-
-        TEXTURE_SIZE = 16  # if one day Mojang changes this I'm going crazy
-
-        texture_cache: dict[str, Image.Image] = {}
+
         faces_processed: list[list[ProcessedFace]] = []
 
+        # Counted in locals and only reported at the end, since
+        # instrumentation is usually off
+        backfaces = degenerate_faces = cache_hits = cache_misses = 0
+
         for element in elements:
             element.do_textures()
 
+        projection = self.projection
+        view = None
+        if projection.view is not None:
+            view = np.array(projection.view, dtype=np.float32), np.array(projection.offset, dtype=np.float32)
+        matrix = np.array(projection.matrix)
+        scale = (self.size[0] / projection.extent[0], self.size[1] / projection.extent[1])
+
         for element, faces, uv_locked in zip(elements, element_faces, uv_locked_faces):
             part = []
             for face_name_ in element.faces.keys():
@@ -369,9 +585,11 @@ class Renderer:
                 face_3D_: npt.NDArray[np.float32] = faces[i_] / TEXTURE_SIZE
 
                 # 1b:
-                face_ = face_3D_ @ np.array([[1, 0], [0, 1], [0, -0.5]])
+                if view is not None:
+                    face_3D_ = face_3D_ @ view[0] + view[1]
+                face_: npt.NDArray[np.float32] = face_3D_ @ matrix
                 face_[:, 1] = 1 - face_[:, 1]
-                face_ *= (Renderer.size[0], Renderer.size[1] * 2 / 3)
+                face_ *= scale
 
                 # 1c: backface culling (shoelace formula without abs or halving)
                 array_range = np.arange(len(face_))
@@ -380,6 +598,7 @@ class Renderer:
                     - np.dot(face_[:, 1], face_[array_range - 1, 0])
                     <= 0
                 ):
+                    backfaces += 1
                     continue
 
                 # 1d:
@@ -388,7 +607,8 @@ class Renderer:
                 if "uv" in raw_faces:
                     uv_: list[int] = raw_faces["uv"]
                 else:
-                    uv_locked_face = uv_locked[i_]
+                    # Copied, since the faces are used again for other projections
+                    uv_locked_face = uv_locked[i_].copy()
 
                     # Note that after the y-flip, all top left corners are at the
                     # lowest of their coordinates.
@@ -428,14 +648,11 @@ class Renderer:
 
                 # 1f:
                 texture_: str = element.faces[Renderer.directions[i_]]["texture"]
-                if ":" not in texture_:
-                    namespace, branch = "minecraft", texture_
+                if texture_ in self.textures:
+                    cache_hits += 1
                 else:
-                    namespace, branch = texture_.split(":")
-                texture_path = f"""assets_renderer/mcassets/{namespace}/textures/{branch}.png"""
-                if texture_ not in texture_cache:
-                    with Image.open(texture_path) as image:
-                        texture_cache[texture_] = image.convert("RGBA")
+                    cache_misses += 1
+                    self.textures.load(texture_)
 
                 # 1g:
 
@@ -460,6 +677,7 @@ class Renderer:
 
                 # Face has 0 width or height, skip
                 if p1_x_intercept_ == p2_x_intercept_ or p1_y_intercept_ == p2_y_intercept_:
+                    degenerate_faces += 1
                     continue
 
                 part.append(
@@ -468,6 +686,7 @@ class Renderer:
                         uv_,
                         texture_,
                         face_3D_,
+                        face_,
                         (slope_x_, slope_y_),
                         (p1_x_intercept_, p1_y_intercept_, p2_x_intercept_, p2_y_intercept_),
                         rotation_,
@@ -476,95 +695,69 @@ class Renderer:
                 )
             faces_processed.append(part)
 
-        # x and y are horizontal and vertical
-        # As a result, indexing is [y][x] since it goes [vertical][horizontal]
-        for x in range(Renderer.size[0]):
-            for y in range(Renderer.size[1]):
-                for element_processed in faces_processed:
-                    for face_processed in element_processed:
-                        slope_x, slope_y = face_processed.slopes
-                        p1_x_intercept, p1_y_intercept, p2_x_intercept, p2_y_intercept = face_processed.intercepts
-                        x_middle, y_middle = x + 0.5001, y + 0.5001
-
-                        # 2a:
-                        # Possibility of divide by 0 checked above
-                        x_intercept = y_middle - slope_x * (x_middle) if slope_x is not None else x_middle
-                        texture_x = (x_intercept - p1_x_intercept) / (p2_x_intercept - p1_x_intercept)
-                        if not 0 <= texture_x < 1:
-                            continue
-
-                        y_intercept = y_middle - slope_y * (x_middle) if slope_y is not None else x_middle
-                        texture_y = (y_intercept - p1_y_intercept) / (p2_y_intercept - p1_y_intercept)
-                        if not 0 <= texture_y < 1:
-                            continue
-
-                        face_3D: npt.NDArray[np.float32] = face_processed.face_3D
-
-                        # 2b:
-                        z1 = interpolate(face_3D[0, 2], face_3D[1, 2], texture_y)
-                        z2 = interpolate(face_3D[3, 2], face_3D[2, 2], texture_y)
-                        z = interpolate(z1, z2, texture_x)
-
-                        if z <= self.depth_buffer[x, y]:
-                            continue
-
-                        image = texture_cache[face_processed.texture]
-
-                        # 2c:
-                        x_inv = p1_x_intercept > p2_x_intercept
-                        y_inv = p1_y_intercept > p2_y_intercept
-
-                        # Searching textures shows rotation can only be
-                        # 0, 90, 180, or 270 (rarely 0)
-                        match face_processed.rotation:
-                            case 0:
-                                pass
-                            case 90:
-                                texture_x, texture_y = texture_y, 1 - texture_x
-                                y_inv = not y_inv
-                            case 180:
-                                texture_x, texture_y = 1 - texture_x, 1 - texture_y
-                                x_inv = not x_inv
-                                y_inv = not y_inv
-                            case 270:
-                                texture_x, texture_y = 1 - texture_y, texture_x
-                                x_inv = not x_inv
-                            case other:
-                                raise ValueError(
-                                    f"Texture rotation {other} not in 0, 90, 180, 270."
-                                )
-
-                        # 2d:
-                        u, v, s, t = face_processed.uv
-
-                        texture_x_pixels = min(
-                            floor(interpolate(u, s, texture_x) / TEXTURE_SIZE * image.width),
-                            image.width - 1,
-                        )
-
-                        # For animated textures, only get first frame
-                        # For liquid textures, cut in half (not implemented)
-                        texture_y_pixels = min(
-                            floor(interpolate(v, t, texture_y) / TEXTURE_SIZE * image.width),
-                            image.width - 1,
-                        )
-
-                        # 2e:
-                        pixel = image.getpixel((texture_x_pixels, texture_y_pixels))
-                        if isinstance(pixel, tuple) and pixel[3] != 0:
-                            if pixel[3] == 255:
-                                # No depth buffer writing if translucent pixel
-                                self.depth_buffer[x, y] = z
-
-                            if face_processed.color and color is not None:
-                                pixel = (
-                                    int(pixel[0] * color[0] / 255),
-                                    int(pixel[1] * color[1] / 255),
-                                    int(pixel[2] * color[2] / 255),
-                                    int(pixel[3] * color[3] / 255),
-                                )
-                            self.output.putpixel((x, y), pixel)
-
-                        # Useful debugging things
-                        # self.output.putpixel((x, y), (texture_x_pixels * 255 // 16, texture_y_pixels * 255 // 16, 0, 255))
-                        # self.output.putpixel((x, y), (int(texture_x * 255), int(texture_y * 255), 0, 255))
+        if instrumentation.enabled:
+            instrumentation.count("faces_culled_backface", backfaces)
+            instrumentation.count("faces_skipped_degenerate", degenerate_faces)
+            instrumentation.count("texture_cache_hits", cache_hits)
+            instrumentation.count("texture_cache_misses", cache_misses)
+        return faces_processed
+
+    # @profile
+    def raytrace(
+        self,
+        elements: list[ModelElement],
+        element_faces: list[npt.NDArray[np.float32]],
+        uv_locked_faces: list[npt.NDArray[np.float32]],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> None:
+        """
+        Renders the texture to :attr:`output`.
+
+        Parameters
+        ----------
+        elements
+            List of elements to render.
+        element_faces
+            List of faces of each element, generated with :meth:`~.d_faces`.
+        uv_locked_faces
+            Faces respecting uvlock, where the faces are not rotated if uv lock is on.
+        color
+            A optional rgba tuple specifying the color (colormap).
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If uv was not present and rotation is not a multiple of 90 degrees,
+            since inferring uvs (or uvlock) only works with a face parallel to
+            one of the planes (see :meth:`process_faces`).
+            Or if the texture uv rotation is not a multiple of 90.
+        """
+        # How RSM Renderer works:
+        # 1. Pre-process each face so this thing runs faster, see :meth:`process_faces`
+        # 2. Draw each pixel, see :class:`~.PythonBackend`
+        faces_processed = self.process_faces(elements, element_faces, uv_locked_faces)
+        self.draw([face for element_processed in faces_processed for face in element_processed], color)
+
+    def draw(self, faces: list[ProcessedFace], color: Optional[tuple[int, int, int, int]] = None) -> None:
+        """
+        Draws processed faces to :attr:`output`, like :meth:`raytrace`.
+
+        Parameters
+        ----------
+        faces
+            The faces, from :meth:`process_faces` or :meth:`compile`.
+        color
+            A optional rgba tuple specifying the color (colormap).
+
+        Returns
+        -------
+        None
+        """
+        self.backend.rasterize(self, faces, color)
+
+        if instrumentation.enabled:
+            instrumentation.count("pixels_tested", self.size[0] * self.size[1] * len(faces))
@@ -0,0 +1,234 @@
+from Joiner import Joiner
+from CostModel import CostModel
+from TextureStore import TextureStore
+
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from math import ceil
+from time import perf_counter
+from typing import Optional
+
+# Joiners of the running build, for worker processes. Forked workers
+# inherit them, since parse_state arguments (like key lambdas) can't be pickled.
+_joiners: list[Joiner] = []
+
+
+def _render(job: tuple[int, str, int, int]) -> tuple[float, int]:
+    index, output, start, stop = job
+    joiner = _joiners[index]
+    files, keys_order, kwargs = joiner.atlases[output]
+    begin = perf_counter()
+    # Tiles go to the tile store, the atlas is merged by the scheduler
+    count = sum(1 for _ in joiner.iter_tiles(files, keys_order, output=output, indices=range(start, stop), **kwargs))
+    return perf_counter() - begin, count
+
+
+@dataclass
+class WorkUnit:
+    """
+    A batch of consecutive tiles of an atlas.
+    """
+
+    joiner: int  # index in Scheduler.joiners
+    output: str
+    start: int
+    stop: int
+    cost: float  # estimated seconds
+
+
+class Scheduler:
+    """
+    Renders every atlas planned by :meth:`Joiner.parse_state` (see
+    :attr:`Joiner.plan_only`) on worker processes, longest work first.
+    Atlases take from under a second to minutes, so the biggest are split
+    into batches of tiles, and batches are handed out by their estimated
+    cost (see :class:`~.CostModel`) so that no worker is left with a long
+    atlas at the end. Tiles go through the joiners' :class:`~.TileStore`,
+    and each atlas is merged as soon as its last batch is done.
+    Textures are decoded once, before workers start, into a
+    :class:`~.TextureStore` that every worker reads from.
+    """
+
+    # Faces are counted on this many tiles of each atlas
+    SAMPLES = 8
+
+    joiners: list[Joiner]
+    costs: CostModel
+    workers: int
+    batches: int
+    faces: dict[tuple[int, str], float]  # average faces per tile, by atlas
+
+    def __init__(self, joiners: list[Joiner], costs: CostModel, workers: Optional[int] = None, batches: int = 4) -> None:
+        """
+        Parameters
+        ----------
+        joiners
+            The joiners, with their atlases planned and a tile store.
+        costs
+            The :class:`~.CostModel` to estimate with, updated after the build.
+        workers
+            Number of worker processes, by default the number of CPUs.
+        batches
+            Number of batches per worker that the total cost is split into,
+            atlases longer than a batch are split.
+        """
+        self.joiners = joiners
+        self.costs = costs
+        self.workers = workers or multiprocessing.cpu_count()
+        self.batches = batches
+        self.faces = {}
+
+    def count_faces(self, joiner: Joiner, files: list[str], states: list[dict[str, str]]) -> float:
+        """
+        Count the average faces per tile of an atlas, on a few tiles spread over it.
+
+        Parameters
+        ----------
+        joiner
+            The joiner the atlas was planned with.
+        files
+            The block state files of the atlas.
+        states
+            The enumerated block states of the atlas.
+
+        Returns
+        -------
+        float
+            The average number of faces drawn per tile.
+        """
+        tiles = [(file, state_dict) for file in files for state_dict in states]
+        step = max(1, len(tiles) // self.SAMPLES)
+        sample = tiles[::step][: self.SAMPLES]
+        faces = sum(len(joiner.get_faces(joiner.get_state_parser(file), state_dict)) for file, state_dict in sample)
+        return faces / len(sample) if sample else 0
+
+    def name(self, index: int, output: str) -> str:
+        # Both namespaces can have an atlas of the same name
+        return f"{self.joiners[index].namespace}/{output}"
+
+    def plan(self) -> list[WorkUnit]:
+        """
+        Estimate every atlas and split it into work units.
+
+        Returns
+        -------
+        list
+            The :class:`WorkUnit` of every atlas, longest first.
+        """
+        atlases = []
+        for index, joiner in enumerate(self.joiners):
+            for output, (files, keys_order, kwargs) in joiner.atlases.items():
+                key, constraints = kwargs["key"], kwargs["constraints"]
+                values, _, _ = joiner.get_layout(files, keys_order, kwargs["custom_values"], key, constraints)
+                states = list(joiner.enumerate_states(values, key, constraints))
+                tiles = len(files) * len(states)
+                self.faces[index, output] = self.count_faces(joiner, files, states)
+                cost = self.costs.estimate(self.name(index, output), tiles, self.faces[index, output])
+                atlases.append((index, output, tiles, cost))
+
+        target = sum(cost for *_, cost in atlases) / (self.workers * self.batches)
+        units = []
+        for index, output, tiles, cost in atlases:
+            count = min(tiles, ceil(cost / target)) if target > 0 else 1
+            count = max(count, 1)
+            for i in range(count):
+                start, stop = tiles * i // count, tiles * (i + 1) // count
+                units.append(WorkUnit(index, output, start, stop, cost * (stop - start) / max(tiles, 1)))
+        units.sort(key=lambda unit: unit.cost, reverse=True)
+        return units
+
+    def share_textures(self) -> TextureStore:
+        """
+        Decode the textures of every planned atlas into a shared store,
+        and make the joiners use it.
+
+        Returns
+        -------
+        :class:`~.TextureStore`
+            The store, to close after the build.
+        """
+        images = {}
+        for joiner in self.joiners:
+            for files, _, _ in joiner.atlases.values():
+                joiner.prefetch(files)
+            for texture, image in joiner.textures.textures.items():
+                images[joiner.textures.path(texture)] = image
+        store = TextureStore.create(images)
+        for joiner in self.joiners:
+            joiner.textures.share(store)
+        return store
+
+    def merge(self, index: int, output: str) -> None:
+        # The usual parse_state, with every tile loaded from the tile store
+        joiner = self.joiners[index]
+        joiner.merge = True
+        try:
+            joiner.rebuild(output)
+        finally:
+            joiner.merge = False
+
+    def run(self) -> None:
+        """
+        Render and save every planned atlas, and save the new timings to the cost model.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If a joiner has no tile store, or processes can't be forked here.
+        """
+        if any(joiner.tiles is None for joiner in self.joiners):
+            raise ValueError("Scheduled builds need a tile store.")
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("Scheduled builds need forked worker processes.")
+
+        global _joiners
+        _joiners = self.joiners
+        units = self.plan()
+        print(f"Scheduled {len(units)} batches, estimated {sum(unit.cost for unit in units):.2f}s", flush=True)
+
+        remaining = Counter((unit.joiner, unit.output) for unit in units)
+        seconds: dict[tuple[int, str], float] = defaultdict(float)
+        tiles: dict[tuple[int, str], int] = defaultdict(int)
+        for index, output in remaining:
+            joiner = self.joiners[index]
+            files, keys_order, kwargs = joiner.atlases[output]
+            values, width, height = joiner.get_layout(
+                files, keys_order, kwargs["custom_values"], kwargs["key"], kwargs["constraints"]
+            )
+            joiner.prepare_tiles(files, output, values, width, height)
+
+        start = perf_counter()
+        # Before forking, so that workers inherit the mapping
+        store = self.share_textures()
+        context = multiprocessing.get_context("fork")
+        try:
+            with ProcessPoolExecutor(self.workers, mp_context=context) as executor:
+                # Submitted longest first, idle workers take the next one in order
+                futures = {
+                    executor.submit(_render, (unit.joiner, unit.output, unit.start, unit.stop)): unit
+                    for unit in units
+                }
+                for future in as_completed(futures):
+                    unit = futures[future]
+                    atlas = unit.joiner, unit.output
+                    elapsed, count = future.result()
+                    seconds[atlas] += elapsed
+                    tiles[atlas] += count
+                    remaining[atlas] -= 1
+                    if remaining[atlas] == 0:
+                        self.merge(*atlas)
+                        # Resumed tiles weren't rendered, so they'd skew the history
+                        if not self.joiners[unit.joiner].resume:
+                            self.costs.record(self.name(*atlas), tiles[atlas], self.faces[atlas], seconds[atlas])
+        finally:
+            for joiner in self.joiners:
+                joiner.textures.unshare()
+            store.close()
+        self.costs.save()
+        print(f"Rendered {len(remaining)} atlases in {perf_counter() - start:.2f}s", flush=True)
@@ -0,0 +1,59 @@
+from math import ceil, sqrt
+from typing import Optional
+
+
+class ShelfPacker:
+    """
+    Packs rectangles into a sheet, row by row ("shelves"), tallest first.
+    Not the densest packing, but deterministic and good enough for
+    rectangles of similar heights like textures and block sprites.
+    """
+
+    max_width: Optional[int]
+
+    def __init__(self, max_width: Optional[int] = None) -> None:
+        """
+        Parameters
+        ----------
+        max_width
+            The width of the sheet. By default, the sheet is kept
+            roughly square.
+        """
+        self.max_width = max_width
+
+    def pack(self, sizes: list[tuple[int, int]]) -> tuple[list[tuple[int, int]], tuple[int, int]]:
+        """
+        Pack rectangles.
+
+        Parameters
+        ----------
+        sizes
+            The (width, height) of each rectangle.
+
+        Returns
+        -------
+        tuple
+            The (x, y) position of each rectangle in the same order as `sizes`,
+            and the (width, height) of the sheet.
+        """
+        if len(sizes) == 0:
+            return [], (0, 0)
+        widest = max(w for w, _ in sizes)
+        if self.max_width is not None:
+            max_width = max(self.max_width, widest)
+        else:
+            max_width = max(widest, ceil(sqrt(sum(w * h for w, h in sizes))))
+
+        positions: list[tuple[int, int]] = [(0, 0)] * len(sizes)
+        order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+        x = y = shelf_height = width = 0
+        for i in order:
+            w, h = sizes[i]
+            if x + w > max_width:
+                y += shelf_height
+                x = shelf_height = 0
+            positions[i] = (x, y)
+            x += w
+            width = max(width, x)
+            shelf_height = max(shelf_height, h)
+        return positions, (width, y + shelf_height)
@@ -204,3 +204,30 @@ class StateParser(Parser):
                 raise ValueError(
                     f'Expected either "variants" or "multipart" textures, got {other}.'
                 )
+
+    def get_models(self) -> set[str]:
+        """
+        Get every model the block state file can apply, whatever the state.
+
+        Returns
+        -------
+        set
+            The model identifiers.
+        """
+        key = next(iter(self.properties.keys()))
+        data = self.properties[key]
+        match key:
+            case "variants":
+                applies = list(data.values()) if isinstance(data, dict) else []
+            case "multipart":
+                applies = [part["apply"] for part in data] if isinstance(data, list) else []
+            case _:
+                applies = []
+
+        models: set[str] = set()
+        for apply in applies:
+            # Either a single model or a list of weighted ones
+            for model in apply if isinstance(apply, list) else [apply]:
+                if isinstance(model, dict) and isinstance(model.get("model"), str):
+                    models.add(model["model"])
+        return models
@@ -0,0 +1,227 @@
+from StateParser import StateParser
+
+import hashlib
+import json
+import numpy as np
+import numpy.typing as npt
+import os
+import tempfile
+from itertools import product
+from math import prod
+from typing import Optional
+
+
+class StateTable:
+    """
+    A block state file compiled into a lookup table: its property domains
+    in order (:attr:`StateParser.states`), the distinct model applications,
+    and for every state in the product of the domains, the applications
+    :meth:`StateParser.get_state` resolves it to.
+    Tables are saved to a folder by a hash of the file contents, so that
+    later builds skip parsing and resolving until the file changes.
+
+    States are numbered in the order of the product of the domains.
+    Applications of state `i` are `ids[offsets[i]:offsets[i + 1]]`,
+    and `valid[i]` is false for states that aren't in the file.
+    """
+
+    # Bumped when the format or resolution changes, to ignore old tables
+    VERSION = 1
+    # Bigger files are resolved by the parser every time
+    MAX_STATES = 1 << 16
+
+    domains: dict[str, list[str]]
+    applications: list[dict | list]  # json entries of the file
+    valid: npt.NDArray[np.bool_]
+    offsets: npt.NDArray[np.int32]
+    ids: npt.NDArray[np.int32]
+    strides: dict[str, int]
+    positions: dict[str, dict[str, int]]  # index of each value in its domain
+
+    def __init__(
+        self,
+        domains: dict[str, list[str]],
+        applications: list[dict | list],
+        valid: npt.NDArray[np.bool_],
+        offsets: npt.NDArray[np.int32],
+        ids: npt.NDArray[np.int32],
+    ) -> None:
+        self.domains = domains
+        self.applications = applications
+        self.valid = valid
+        self.offsets = offsets
+        self.ids = ids
+        self.strides = {}
+        stride = 1
+        for key in reversed(domains):
+            self.strides[key] = stride
+            stride *= len(domains[key])
+        self.positions = {key: {value: i for i, value in enumerate(values)} for key, values in domains.items()}
+
+    @staticmethod
+    def compile(state_parser: StateParser) -> Optional["StateTable"]:
+        """
+        Resolve every state of a parsed block state file.
+
+        Parameters
+        ----------
+        state_parser
+            The parsed :class:`~.StateParser`.
+
+        Returns
+        -------
+        :class:`StateTable` or None
+            The table, or None if the file has more than :attr:`MAX_STATES` states.
+        """
+        domains = state_parser.states
+        if prod(len(values) for values in domains.values()) > StateTable.MAX_STATES:
+            return None
+
+        applications: list[dict | list] = []
+        application_ids: dict[str, int] = {}  # by json
+        valid, offsets, ids = [], [0], []
+        keys = list(domains)
+        for combination in product(*domains.values()):
+            try:
+                resolved = state_parser.get_state(dict(zip(keys, combination)))
+            except ValueError:
+                resolved = None
+            valid.append(resolved is not None)
+            for application in resolved or []:
+                dumped = json.dumps(application, sort_keys=True)
+                if dumped not in application_ids:
+                    application_ids[dumped] = len(applications)
+                    applications.append(application)
+                ids.append(application_ids[dumped])
+            offsets.append(len(ids))
+        return StateTable(
+            domains,
+            applications,
+            np.array(valid, dtype=np.bool_),
+            np.array(offsets, dtype=np.int32),
+            np.array(ids, dtype=np.int32),
+        )
+
+    @staticmethod
+    def path(root: str, source: str) -> str:
+        """
+        Get the file a table is saved as.
+
+        Parameters
+        ----------
+        root
+            The folder of saved tables.
+        source
+            The contents of the block state file.
+
+        Returns
+        -------
+        str
+            The path, named by a hash of the contents.
+        """
+        digest = hashlib.sha1(f"{StateTable.VERSION}\n{source}".encode()).hexdigest()
+        return os.path.join(root, f"{digest}.json")
+
+    @staticmethod
+    def load(path: str) -> Optional["StateTable"]:
+        """
+        Load a saved table.
+
+        Parameters
+        ----------
+        path
+            The path from :meth:`path`.
+
+        Returns
+        -------
+        :class:`StateTable` or None
+            The table, or None if it isn't saved.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return StateTable(
+            data["domains"],
+            data["applications"],
+            np.array(data["valid"], dtype=np.bool_),
+            np.array(data["offsets"], dtype=np.int32),
+            np.array(data["ids"], dtype=np.int32),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Save the table.
+
+        Parameters
+        ----------
+        path
+            The path from :meth:`path`.
+
+        Returns
+        -------
+        None
+        """
+        data = {
+            "domains": self.domains,
+            "applications": self.applications,
+            "valid": self.valid.astype(int).tolist(),
+            "offsets": self.offsets.tolist(),
+            "ids": self.ids.tolist(),
+        }
+        # Written to a temporary file first, since prefetching
+        # can save tables of identical files at the same time
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, path)
+
+    def index(self, state_dict: dict[str, str]) -> Optional[int]:
+        """
+        Get the index of a state.
+
+        Parameters
+        ----------
+        state_dict
+            A dictionary of block states.
+
+        Returns
+        -------
+        int or None
+            The index, or None if the state has other keys or values than
+            the file (such as custom values), so the table can't tell.
+        """
+        if len(state_dict) != len(self.domains):
+            return None
+        index = 0
+        for key, value in state_dict.items():
+            positions = self.positions.get(key)
+            if positions is None or value not in positions:
+                return None
+            index += positions[value] * self.strides[key]
+        return index
+
+    def resolve(self, index: int) -> list[dict | list]:
+        """
+        Get the applications of a state, like :meth:`StateParser.get_state`.
+
+        Parameters
+        ----------
+        index
+            The index of the state, from :meth:`index`.
+
+        Returns
+        -------
+        list
+            The json entries of the models the state applies.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the state isn't in the file.
+        """
+        if not self.valid[index]:
+            state = {key: values[index // self.strides[key] % len(values)] for key, values in self.domains.items()}
+            raise ValueError(f"Invalid state: {state}.")
+        return [self.applications[i] for i in self.ids[self.offsets[index]:self.offsets[index + 1]]]
@@ -0,0 +1,134 @@
+import json
+import os
+import random
+from itertools import product
+from PIL import Image
+
+
+class SyntheticAssets:
+    """
+    Generates a block state file, a model and a texture with tunable sizes,
+    for benchmarking how the renderer scales (see `benchmark.py`).
+    Generated assets are random but deterministic for a given seed.
+
+    The block state has `properties` properties with 2 values each, so
+    it has 2 ** `properties` states, each using the model with a different
+    y rotation. The model has `elements` random cuboids, `rotated` of which
+    are rotated by 22.5 or 45 degrees, all using one texture of
+    `texture_size` by `texture_size` pixels.
+    """
+
+    namespace = "synthetic"
+    file = "synthetic.json"
+
+    elements: int
+    rotated: int
+    texture_size: int
+    properties: int
+    seed: int
+
+    def __init__(
+        self,
+        *,
+        elements: int = 4,
+        rotated: int = 0,
+        texture_size: int = 16,
+        properties: int = 1,
+        seed: int = 0,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        elements
+            The number of elements in the model.
+        rotated
+            How many of the elements are rotated.
+        texture_size
+            The width and height of the texture, in pixels.
+        properties
+            The number of block state properties.
+        seed
+            The random seed.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If a parameter is out of range.
+        """
+        if elements < 1 or not 0 <= rotated <= elements:
+            raise ValueError(f"Invalid element counts: {rotated} rotated of {elements}.")
+        if texture_size < 1 or properties < 0:
+            raise ValueError(f"Invalid texture size {texture_size} or property count {properties}.")
+        self.elements = elements
+        self.rotated = rotated
+        self.texture_size = texture_size
+        self.properties = properties
+        self.seed = seed
+
+    def keys(self) -> list[str]:
+        """
+        Get the property names, to use as the keys order of the atlas.
+
+        Returns
+        -------
+        list
+            The property names.
+        """
+        return [f"p{i}" for i in range(self.properties)]
+
+    def generate(self, root: str) -> None:
+        """
+        Write the assets into an assets root, in the :attr:`namespace` folder.
+
+        Parameters
+        ----------
+        root
+            The assets root.
+
+        Returns
+        -------
+        None
+        """
+        rng = random.Random(self.seed)
+        folder = os.path.join(root, SyntheticAssets.namespace)
+        for branch in ["blockstates", "models/block", "textures/block"]:
+            os.makedirs(os.path.join(folder, branch), exist_ok=True)
+
+        # Same order as Minecraft's block state files
+        variants = {}
+        for i, values in enumerate(product(["a", "b"], repeat=self.properties)):
+            name = ",".join(f"{key}={value}" for key, value in zip(self.keys(), values))
+            variants[name] = {"model": "synthetic:block/synthetic", "y": 90 * (i % 4)}
+        with open(os.path.join(folder, "blockstates", SyntheticAssets.file), "w") as f:
+            json.dump({"variants": variants}, f, indent=1)
+
+        elements = []
+        for i in range(self.elements):
+            start = [rng.randint(0, 12) for _ in range(3)]
+            end = [s + rng.randint(1, 16 - s) for s in start]
+            element = {
+                "from": start,
+                "to": end,
+                "faces": {
+                    direction: {"uv": [0, 0, 16, 16], "texture": "#all"}
+                    for direction in ["down", "up", "north", "south", "west", "east"]
+                },
+            }
+            if i < self.rotated:
+                element["rotation"] = {
+                    "origin": [8, 8, 8],
+                    "axis": rng.choice("xyz"),
+                    "angle": rng.choice([-45, -22.5, 22.5, 45]),
+                }
+            elements.append(element)
+        model = {"textures": {"all": "synthetic:block/synthetic"}, "elements": elements}
+        with open(os.path.join(folder, "models", "block", "synthetic.json"), "w") as f:
+            json.dump(model, f, indent=1)
+
+        # Some translucent and transparent texels, so every path of the renderer is used
+        texture = Image.new("RGBA", (self.texture_size, self.texture_size))
+        texture.putdata([
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.choice([0, 128, 255, 255, 255]))
+            for _ in range(self.texture_size * self.texture_size)
+        ])
+        texture.save(os.path.join(folder, "textures", "block", "synthetic.png"))
@@ -0,0 +1,107 @@
+import Renderer
+
+import numpy as np
+import numpy.typing as npt
+
+from typing import Optional
+
+
+class TexelMap:
+    """
+    The texture coordinates of every pixel of every face drawn by a
+    :class:`~.Renderer`, recorded while it renders (see :attr:`Renderer.texel_map`).
+    Replaying the map with other textures, like the other frames of animated
+    textures, draws the same tile without any of the geometry work: each
+    face is a gather of texels and a depth test.
+
+    Fragments hidden by the depth test are recorded too, since a pixel that
+    is covered in one frame can show through a transparent texel in another.
+    """
+
+    faces: list[tuple[str, bool]]  # texture, and whether it takes the colormap
+    fragments: list[list[tuple[int, int, int, int, float]]]  # x, y, texel x, texel y, depth
+    arrays: Optional[list[tuple[npt.NDArray[np.intp], ...]]]
+
+    def __init__(self) -> None:
+        self.faces = []
+        self.fragments = []
+        self.arrays = None
+
+    def add_face(self, texture: str, tinted: bool) -> list[tuple[int, int, int, int, float]]:
+        """
+        Add a face, in drawing order.
+
+        Parameters
+        ----------
+        texture
+            The texture of the face.
+        tinted
+            Whether the face takes the block color.
+
+        Returns
+        -------
+        list
+            The list the renderer appends the face's fragments to.
+        """
+        self.faces.append((texture, tinted))
+        self.fragments.append([])
+        self.arrays = None
+        return self.fragments[-1]
+
+    def textures(self) -> set[str]:
+        """
+        Get the textures of the drawn faces.
+
+        Returns
+        -------
+        set
+            The texture names.
+        """
+        return {texture for (texture, _), fragments in zip(self.faces, self.fragments) if fragments}
+
+    def replay(
+        self,
+        textures: dict[str, npt.NDArray[np.uint8]],
+        color: Optional[tuple[int, int, int, int]] = None,
+    ) -> npt.NDArray[np.uint8]:
+        """
+        Draw the recorded faces again with the given textures.
+        Gives the same pixels as the renderer when given the textures it used.
+
+        Parameters
+        ----------
+        textures
+            An rgba array ([y][x]) for every texture in :meth:`textures`.
+            Only the top square is used, like the renderer.
+        color
+            An optional tuple of (r, g, b, a) specifying the block color (colormap).
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            The tile, as an rgba array indexed [y][x].
+        """
+        if self.arrays is None:
+            self.arrays = []
+            for fragments in self.fragments:
+                columns = np.array(fragments, dtype=np.float64).reshape(-1, 5).T
+                self.arrays.append((*columns[:4].astype(np.intp), columns[4]))
+
+        width, height = Renderer.Renderer.size
+        output = np.zeros((height, width, 4), dtype=np.uint8)
+        # Same dtype as the renderer's depth buffer, so that rounding matches
+        depth_buffer = np.full((width, height), -1, dtype=np.float32)
+        for (texture, tinted), (x, y, texture_x, texture_y, z) in zip(self.faces, self.arrays):
+            if len(z) == 0:
+                continue
+            pixels = textures[texture][texture_y, texture_x]
+            # Pixels of one face never overlap, so the whole face is tested at once
+            drawn = (pixels[:, 3] != 0) & (z > depth_buffer[x, y])
+            opaque = drawn & (pixels[:, 3] == 255)
+            depth_buffer[x[opaque], y[opaque]] = z[opaque]
+            pixels = pixels[drawn]
+            if tinted and color is not None:
+                # Same as int(pixel * color / 255) in the renderer
+                pixels = (pixels * np.array(color, dtype=np.float64) / 255).astype(np.uint8)
+            output[y[drawn], x[drawn]] = pixels
+        return output
@@ -0,0 +1,242 @@
+from TextureStore import TextureStore
+
+from PIL import Image
+from math import lcm
+from os.path import exists, join
+from typing import Optional
+import json
+
+
+class TextureCache:
+    """
+    Decoded textures, shared between renders so that each texture
+    is only opened once. Textures can also come from a
+    :class:`~.TextureStore` shared between processes, see :meth:`share`.
+    """
+
+    textures: dict[str, Image.Image]
+    animations: dict[str, Optional[list[tuple[int, int]]]]
+    opacity: dict[str, bool]  # see opaque
+    root: str
+    store: Optional[TextureStore]
+
+    def __init__(self, root: str) -> None:
+        self.textures = {}
+        self.animations = {}
+        self.opacity = {}
+        self.root = root
+        self.store = None
+
+    def path(self, texture: str) -> str:
+        """
+        Get the file name of a texture.
+
+        Parameters
+        ----------
+        texture
+            The texture, as an identifier name.
+
+        Returns
+        -------
+        str
+            The path of the texture png.
+        """
+        if ":" not in texture:
+            namespace, branch = "minecraft", texture
+        else:
+            namespace, branch = texture.split(":")
+        return join(self.root, namespace, "textures", f"{branch}.png")
+
+    def load(self, texture: str) -> None:
+        """
+        Open and decode a texture if it isn't cached yet.
+        Safe to call from multiple threads.
+
+        Parameters
+        ----------
+        texture
+            The texture, as an identifier name.
+
+        Returns
+        -------
+        None
+        """
+        if texture not in self.textures:
+            if self.store is not None and self.path(texture) in self.store:
+                self.textures[texture] = self.store.get(self.path(texture))
+                return
+            with Image.open(self.path(texture)) as image:
+                self.textures[texture] = image.convert("RGBA")
+
+    def share(self, store: TextureStore) -> None:
+        """
+        Use textures from a shared store from now on. Textures already
+        decoded are replaced by the store's, to free their memory.
+
+        Parameters
+        ----------
+        store
+            The :class:`~.TextureStore`, usually made from this cache.
+
+        Returns
+        -------
+        None
+        """
+        self.store = store
+        for texture in list(self.textures):
+            if self.path(texture) in store:
+                self.textures[texture] = store.get(self.path(texture))
+
+    def unshare(self) -> None:
+        """
+        Stop using the shared store, before it's closed. Its textures
+        are decoded again when needed.
+
+        Returns
+        -------
+        None
+        """
+        if self.store is None:
+            return
+        for texture in list(self.textures):
+            if self.path(texture) in self.store:
+                del self.textures[texture]
+        self.store = None
+
+    def get(self, texture: str) -> Image.Image:
+        """
+        Get a texture, loading it if needed.
+
+        Parameters
+        ----------
+        texture
+            The texture, as an identifier name.
+
+        Returns
+        -------
+        Image.Image
+            The texture in RGBA.
+        """
+        self.load(texture)
+        return self.textures[texture]
+
+    def __contains__(self, texture: str) -> bool:
+        return texture in self.textures
+
+    def opaque(self, texture: str) -> bool:
+        """
+        Check whether a texture is opaque everywhere, in every frame.
+
+        Parameters
+        ----------
+        texture
+            The texture, as an identifier name.
+
+        Returns
+        -------
+        bool
+            Whether every texel has an alpha of 255.
+        """
+        if texture not in self.opacity:
+            alpha = self.get(texture).getchannel("A")
+            self.opacity[texture] = alpha.getextrema()[0] == 255
+        return self.opacity[texture]
+
+    def animation(self, texture: str) -> Optional[list[tuple[int, int]]]:
+        """
+        Get the frames of an animated texture from its `.mcmeta` file.
+        Frames are squares stacked vertically in the texture, and
+        interpolation between frames is ignored.
+
+        Parameters
+        ----------
+        texture
+            The texture, as an identifier name.
+
+        Returns
+        -------
+        list or None
+            The (frame index, duration in ticks) of each frame in order,
+            or None if the texture isn't animated.
+        """
+        if texture not in self.animations:
+            meta = f"{self.path(texture)}.mcmeta"
+            if not exists(meta):
+                self.animations[texture] = None
+                return None
+            with open(meta) as f:
+                animation = json.load(f).get("animation", {})
+            image = self.get(texture)
+            frametime = animation.get("frametime", 1)
+            frames = animation.get("frames", range(image.height // image.width))
+            self.animations[texture] = [
+                (frame, frametime) if isinstance(frame, int)
+                else (frame["index"], frame.get("time", frametime))
+                for frame in frames
+            ]
+        return self.animations[texture]
+
+    def frame(self, texture: str, index: int) -> Image.Image:
+        """
+        Get one frame of a texture.
+
+        Parameters
+        ----------
+        texture
+            The texture, as an identifier name.
+        index
+            The index of the frame, from the top.
+
+        Returns
+        -------
+        Image.Image
+            The frame in RGBA.
+        """
+        image = self.get(texture)
+        return image.crop((0, index * image.width, image.width, (index + 1) * image.width))
+
+    def timeline(self, textures: set[str], max_frames: int = 256) -> list[tuple[int, dict[str, int]]]:
+        """
+        Combine the animations of several textures into one, with a frame
+        every time any of the textures changes, over a common period.
+
+        Parameters
+        ----------
+        textures
+            The textures, animated or not.
+        max_frames
+            The maximum number of frames. Longer timelines are cut short,
+            since the common period of unrelated animations can be very long.
+
+        Returns
+        -------
+        list
+            The (duration in ticks, frame index of each animated texture) of
+            each frame. Empty if none of the textures are animated.
+        """
+        animations = {}
+        for texture in sorted(textures):
+            animation = self.animation(texture)
+            if animation:
+                animations[texture] = animation
+        if not animations:
+            return []
+
+        period = lcm(*(sum(time for _, time in animation) for animation in animations.values()))
+        # Walk every animation at once, one change of any texture at a time
+        positions = {texture: 0 for texture in animations}  # frame in each animation
+        ends = {texture: 0 for texture in animations}  # tick each frame ends at
+        tick = 0
+        frames: list[tuple[int, dict[str, int]]] = []
+        while tick < period and len(frames) < max_frames:
+            current = {}
+            for texture, animation in animations.items():
+                while ends[texture] <= tick:
+                    if ends[texture] > 0:
+                        positions[texture] = (positions[texture] + 1) % len(animation)
+                    ends[texture] += animation[positions[texture]][1]
+                current[texture] = animation[positions[texture]][0]
+            end = min(ends.values())
+            frames.append((end - tick, current))
+            tick = end
+        return frames
@@ -0,0 +1,151 @@
+from PIL import Image
+from multiprocessing import shared_memory
+from typing import Optional
+
+
+class TextureStore:
+    """
+    Decoded textures packed into one block of shared memory, for worker
+    processes. Textures are decoded once by the parent process, and every
+    worker reads the same pages instead of opening and decoding its own
+    copy, so texture memory doesn't grow with the number of workers.
+
+    Textures are stored by file name (see :meth:`TextureCache.path`), so
+    caches of different roots can share a store.
+    Shared memory is freed with :meth:`close` by the process that created it.
+    """
+
+    memory: Optional[shared_memory.SharedMemory]
+    index: dict[str, tuple[int, int, int]]  # file name -> offset, width, height
+    owner: bool
+
+    def __init__(self, memory: Optional[shared_memory.SharedMemory], index: dict[str, tuple[int, int, int]], owner: bool) -> None:
+        """
+        Use :meth:`create` or :meth:`attach` instead.
+
+        Parameters
+        ----------
+        memory
+            The shared memory holding the textures.
+        index
+            The offset, width and height of each texture in the shared memory, by file name.
+        owner
+            Whether this process created the shared memory, and frees it on :meth:`close`.
+        """
+        self.memory = memory
+        self.index = index
+        self.owner = owner
+
+    @staticmethod
+    def create(images: dict[str, Image.Image]) -> "TextureStore":
+        """
+        Pack textures into a new block of shared memory.
+
+        Parameters
+        ----------
+        images
+            The RGBA textures, by file name.
+
+        Returns
+        -------
+        :class:`TextureStore`
+            The store, owned by this process.
+        """
+        index = {}
+        size = 0
+        for path, image in images.items():
+            index[path] = (size, image.width, image.height)
+            size += image.width * image.height * 4
+        # Shared memory can't be empty
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for path, image in images.items():
+            offset, width, height = index[path]
+            memory.buf[offset:offset + width * height * 4] = image.tobytes()
+        return TextureStore(memory, index, True)
+
+    @staticmethod
+    def attach(name: str, index: dict[str, tuple[int, int, int]]) -> "TextureStore":
+        """
+        Attach to a store created by another process. Forked workers
+        don't need to, since they inherit the mapping.
+
+        Parameters
+        ----------
+        name
+            The name of the shared memory, :attr:`name` of the store.
+        index
+            :attr:`index` of the store.
+
+        Returns
+        -------
+        :class:`TextureStore`
+            The store, which only the creating process can free.
+        """
+        return TextureStore(shared_memory.SharedMemory(name=name), index, False)
+
+    @property
+    def name(self) -> str:
+        """
+        The name of the shared memory, for other processes to :meth:`attach` to the store.
+
+        Returns
+        -------
+        str
+            The name of the shared memory.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the store is closed.
+        """
+        if self.memory is None:
+            raise ValueError("TextureStore is closed")
+        return self.memory.name
+
+    def __contains__(self, path: str) -> bool:
+        return self.memory is not None and path in self.index
+
+    def get(self, path: str) -> Image.Image:
+        """
+        Get a texture, without copying it out of shared memory.
+
+        Parameters
+        ----------
+        path
+            The file name of the texture.
+
+        Returns
+        -------
+        Image.Image
+            The texture in RGBA, read only.
+
+        Raises
+        ------
+        :exc:`ValueError`
+            If the store is closed.
+        """
+        if self.memory is None:
+            raise ValueError("TextureStore is closed")
+        offset, width, height = self.index[path]
+        data = self.memory.buf[offset:offset + width * height * 4]
+        return Image.frombuffer("RGBA", (width, height), data, "raw", "RGBA", 0, 1)
+
+    def close(self) -> None:
+        """
+        Detach from the shared memory, and free it if this process created it.
+        Images from :meth:`get` must not be used anymore.
+
+        Returns
+        -------
+        None
+        """
+        if self.memory is None:
+            return
+        if self.owner:
+            self.memory.unlink()
+        try:
+            self.memory.close()
+        except BufferError:
+            # Images still reference it, the mapping goes once they're collected
+            pass
+        self.memory = None
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+
+
+class TileCache:
+    """
+    A least recently used cache of encoded tiles, bounded by
+    the total size of the tiles in bytes.
+    """
+
+    tiles: OrderedDict[Hashable, bytes]
+    max_bytes: int
+    size: int
+    hits: int
+    misses: int
+    lock: Lock
+
+    def __init__(self, max_bytes: int) -> None:
+        self.tiles = OrderedDict()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """
+        Get a tile, marking it as recently used.
+
+        Parameters
+        ----------
+        key
+            The key of the tile.
+
+        Returns
+        -------
+        bytes or None
+            The encoded tile, or None if it isn't cached.
+        """
+        with self.lock:
+            if key not in self.tiles:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+    def put(self, key: Hashable, tile: bytes) -> None:
+        """
+        Add a tile, evicting the least recently used ones until it fits.
+        Tiles larger than the whole cache aren't kept.
+
+        Parameters
+        ----------
+        key
+            The key of the tile.
+        tile
+            The encoded tile.
+
+        Returns
+        -------
+        None
+        """
+        if len(tile) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.tiles:
+                self.size -= len(self.tiles.pop(key))
+            self.tiles[key] = tile
+            self.size += len(tile)
+            while self.size > self.max_bytes:
+                _, evicted = self.tiles.popitem(last=False)
+                self.size -= len(evicted)
@@ -0,0 +1,204 @@
+import json
+import os
+import tempfile
+from PIL import Image
+from typing import Callable, Optional
+
+
+class TileStore:
+    """
+    A folder of rendered tiles, one png per tile, grouped by atlas.
+    Used to share partial results between build processes (possibly on
+    different machines through a shared folder) and to merge them into
+    atlases afterwards, and to checkpoint tiles so that an interrupted
+    build can resume where it stopped.
+
+    Layout::
+
+        root/
+            atlas_name/
+                layout.json
+                0.png
+                1.png
+                ...
+    """
+
+    root: str
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def folder(self, output: str) -> str:
+        """
+        Get the folder of an atlas.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+
+        Returns
+        -------
+        str
+            The folder its tiles are stored in.
+        """
+        return os.path.join(self.root, os.path.splitext(output)[0])
+
+    def path(self, output: str, index: int) -> str:
+        """
+        Get the file name of a tile.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        index
+            The index of the tile in the atlas, in rendering order.
+
+        Returns
+        -------
+        str
+            The path of the tile png.
+        """
+        return os.path.join(self.folder(output), f"{index}.png")
+
+    def _write(self, path: str, write: Callable[[str], None]) -> None:
+        # Written to a temporary file first, so that a tile is either
+        # complete or missing even if the process is killed
+        # The name is unique across hosts too, since shards on other machines
+        # (often containers with the same pids) write to the same folder
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+            temporary = f.name
+        try:
+            write(temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def save(self, output: str, index: int, image: Image.Image) -> None:
+        """
+        Save a tile.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        index
+            The index of the tile in the atlas.
+        image
+            The rendered tile.
+
+        Returns
+        -------
+        None
+        """
+        self._write(self.path(output, index), lambda path: image.save(path, "png"))
+
+    def has(self, output: str, index: int) -> bool:
+        """
+        Check if a tile is stored.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        index
+            The index of the tile in the atlas.
+
+        Returns
+        -------
+        bool
+            Whether the tile exists.
+        """
+        return os.path.exists(self.path(output, index))
+
+    def load(self, output: str, index: int) -> Image.Image:
+        """
+        Load a tile.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        index
+            The index of the tile in the atlas.
+
+        Returns
+        -------
+        Image.Image
+            The stored tile.
+
+        Raises
+        ------
+        :exc:`FileNotFoundError`
+            If the tile is missing.
+        """
+        path = self.path(output, index)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Tile {index} of {output} is missing, expected at {path}.")
+        with Image.open(path) as image:
+            return image.convert("RGBA")
+
+    def clear(self, output: str) -> None:
+        """
+        Delete the stored tiles of an atlas.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+
+        Returns
+        -------
+        None
+        """
+        folder = self.folder(output)
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.endswith(".png"):
+                    os.remove(os.path.join(folder, name))
+
+    def save_layout(self, output: str, layout: dict) -> None:
+        """
+        Save the layout of an atlas, used to check that tiles were made by
+        builds that agree on the atlas.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+        layout
+            A json-serializable description of the atlas.
+
+        Returns
+        -------
+        None
+        """
+        def dump(path: str) -> None:
+            with open(path, "w") as f:
+                json.dump(layout, f, sort_keys=True)
+
+        self._write(os.path.join(self.folder(output), "layout.json"), dump)
+
+    def load_layout(self, output: str) -> Optional[dict]:
+        """
+        Load the layout of an atlas.
+
+        Parameters
+        ----------
+        output
+            The atlas output file name.
+
+        Returns
+        -------
+        dict or None
+            The layout, or None if it was never saved.
+        """
+        path = os.path.join(self.folder(output), "layout.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,125 @@
+from Joiner import Joiner
+
+import os
+import time
+import traceback
+from typing import Optional
+
+
+class Watcher:
+    """
+    Keeps joiners loaded after a build and renders atlases again when the
+    asset files they're made from change, for editing models and textures
+    without rebuilding everything.
+    Only the cached parsers and textures of changed files are dropped,
+    so a rebuild only reads what changed.
+    Files are polled, which is plenty fast for the few thousand files
+    the atlases use.
+    """
+
+    joiners: list[Joiner]
+    interval: float
+    stamps: dict[str, Optional[tuple[int, int]]]  # modification time and size, None if missing
+
+    def __init__(self, joiners: list[Joiner], interval: float = 0.25) -> None:
+        """
+        Parameters
+        ----------
+        joiners
+            The joiners to watch, after they rendered their atlases.
+        interval
+            Seconds between polls.
+        """
+        self.joiners = joiners
+        self.interval = interval
+        self.stamps = {}
+
+    def stamp(self, path: str) -> Optional[tuple[int, int]]:
+        """
+        Get what a file is compared by between scans.
+
+        Parameters
+        ----------
+        path
+            The path of the file.
+
+        Returns
+        -------
+        tuple or None
+            The modification time in nanoseconds and the size of the file, or None if it doesn't exist.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def scan(self) -> set[str]:
+        """
+        Check the files used by the atlases for changes since the last scan.
+        Files seen for the first time don't count as changed.
+
+        Returns
+        -------
+        set
+            The paths of changed, added or deleted files.
+        """
+        paths = set().union(*(
+            dependencies
+            for joiner in self.joiners
+            for dependencies in joiner.dependencies.values()
+        ))
+        changed = set()
+        for path in paths:
+            stamp = self.stamp(path)
+            if path in self.stamps and self.stamps[path] != stamp:
+                changed.add(path)
+            self.stamps[path] = stamp
+        return changed
+
+    def update(self, changed: set[str]) -> None:
+        """
+        Drop the cached files and render the affected atlases again.
+        Errors are printed instead of raised, so that watching goes on
+        and the atlas is tried again after the next change.
+
+        Parameters
+        ----------
+        changed
+            The paths of the changed files.
+
+        Returns
+        -------
+        None
+        """
+        for joiner in self.joiners:
+            for output in sorted(joiner.invalidate(changed)):
+                start = time.perf_counter()
+                try:
+                    joiner.rebuild(output)
+                except Exception:
+                    traceback.print_exc()
+                    print(f"Failed to render {output}", flush=True)
+                else:
+                    print(f"Rendered {output} in {time.perf_counter() - start:.2f}s", flush=True)
+
+    def run(self) -> None:
+        """
+        Watch until interrupted.
+
+        Returns
+        -------
+        None
+        """
+        self.scan()
+        print(f"Watching {len(self.stamps)} files, press Ctrl+C to stop", flush=True)
+        try:
+            while True:
+                time.sleep(self.interval)
+                changed = self.scan()
+                if changed:
+                    for path in sorted(changed):
+                        print(f"Changed: {path}", flush=True)
+                    self.update(changed)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,108 @@
+from Joiner import Joiner
+from Renderer import Renderer
+from SyntheticAssets import SyntheticAssets
+
+import argparse
+import json
+import sys
+import tempfile
+import tracemalloc
+from math import log
+from typing import Optional
+from time import perf_counter
+
+# Measures how rendering scales with each parameter of the synthetic assets,
+# changing one parameter at a time from the base configuration.
+# `work` is what the time should be proportional to, used to fit the
+# scaling exponent of the sweep on a log-log scale (1 is linear),
+# or None if nothing in particular is expected.
+
+BASE = {"elements": 4, "rotated": 0, "texture_size": 16, "properties": 2, "scale": 1}
+SWEEPS = {
+    "elements": ([1, 2, 4, 8, 16, 32], lambda c: c["elements"]),
+    "rotated": ([0, 1, 2, 4], None),
+    "texture_size": ([16, 32, 64, 128], None),
+    "properties": ([0, 1, 2, 3, 4, 5], lambda c: 2 ** c["properties"]),
+    "scale": ([1, 2, 3, 4], lambda c: c["scale"] ** 2),
+}
+
+
+def run(config: dict, memory: bool, retexture: bool) -> tuple[float, int]:
+    # Returns the time in seconds and peak traced memory in bytes
+    # of rendering every tile of the synthetic atlas from cold caches
+    assets = SyntheticAssets(**{k: v for k, v in config.items() if k != "scale"})
+    size = Renderer.size
+    Renderer.size = (size[0] * config["scale"], size[1] * config["scale"])
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            assets.generate(root)
+            joiner = Joiner(root, SyntheticAssets.namespace, root, retexture=retexture)
+            if memory:
+                tracemalloc.start()
+            start = perf_counter()
+            for _ in joiner.iter_tiles([SyntheticAssets.file], assets.keys()):
+                pass
+            elapsed = perf_counter() - start
+            peak = 0
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            return elapsed, peak
+    finally:
+        Renderer.size = size
+
+
+def fit_exponent(points: list[tuple[float, float]]) -> Optional[float]:
+    # Least squares slope of log(time) against log(work), less noisy than
+    # comparing consecutive points since the generated geometry is random
+    xs = [log(work) for work, _ in points]
+    ys = [log(elapsed) for _, elapsed in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+parser = argparse.ArgumentParser(description="Benchmark how the renderer scales on synthetic assets.")
+parser.add_argument("--sweep", choices=SWEEPS, action="append", help="Only run these sweeps (repeatable).")
+parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration, the fastest is kept.")
+parser.add_argument("--no-memory", action="store_true", help="Skip the extra run measuring peak memory.")
+parser.add_argument("--max-exponent", type=float, default=1.3, help="Fail if a scaling exponent is above this.")
+parser.add_argument("--json", metavar="FILE", help="Save the results to FILE.")
+parser.add_argument(
+    "--no-families",
+    action="store_true",
+    help="Rasterize every tile, instead of replaying tiles of the same shape (see Joiner.get_family).",
+)
+args = parser.parse_args()
+
+results = []
+failed = False
+for name in args.sweep or SWEEPS:
+    values, work = SWEEPS[name]
+    print(f"{name}:")
+    points = []
+    for value in values:
+        config = {**BASE, name: value}
+        if name == "elements":
+            config["rotated"] = min(config["rotated"], value)
+        if name == "rotated":
+            config["elements"] = max(config["elements"], value)
+        elapsed = min(run(config, False, not args.no_families)[0] for _ in range(args.repeat))
+        peak = 0 if args.no_memory else run(config, True, not args.no_families)[1]
+        print(f"  {value:>5} - {elapsed:8.3f}s - {peak / 1024 / 1024:8.2f} MiB", flush=True)
+        results.append({"sweep": name, "config": config, "time": elapsed, "peak_memory": peak})
+        if work is not None:
+            points.append((work(config), elapsed))
+
+    exponent = fit_exponent(points) if points else None
+    if exponent is not None:
+        superlinear = exponent > args.max_exponent
+        failed = failed or superlinear
+        print(f"  exponent {exponent:.2f}" + (" - superlinear" if superlinear else ""))
+
+if args.json is not None:
+    with open(args.json, "w") as f:
+        json.dump(results, f, indent=1)
+sys.exit(1 if failed else 0)
@@ -0,0 +1,107 @@
+from Joiner import Joiner
+from RasterBackend import RasterBackend
+from Renderer import Renderer
+from SyntheticAssets import SyntheticAssets
+
+import argparse
+import os
+import sys
+import tempfile
+from itertools import islice, product
+from time import perf_counter
+
+import numpy as np
+
+# Differential check of the rasterizer backends: renders a corpus of block
+# states with every available backend and compares the images and buffers
+# with the reference. Exits with an error on any difference.
+
+
+def render(joiner: Joiner, backend: RasterBackend, file: str, state_dict: dict[str, str]) -> Renderer:
+    r = Renderer(joiner.textures, backend)
+    for model in joiner.get_state_parser(file).get_state(state_dict):
+        if model["model"] not in joiner.parser_collection:
+            joiner.parser_collection.add(model["model"])
+        r.render(
+            joiner.parser_collection.get(model["model"]),
+            x=model.get("x", 0),
+            y=model.get("y", 0),
+            z=model.get("z", 0),
+            color=(0x77, 0xAB, 0x2F, 0xFF),
+            uv_lock=model.get("uvlock", False),
+        )
+    return r
+
+
+def differences(reference: Renderer, other: Renderer) -> list[str]:
+    buffers = ["depth_buffer", "pixel_depth", "tint_mask", "translucent_mask", "stacked_mask"]
+    different = [name for name in buffers if not np.array_equal(getattr(reference, name), getattr(other, name))]
+    if reference.get_image().tobytes() != other.get_image().tobytes():
+        different.insert(0, "pixels")
+    return different
+
+
+def compare(joiner: Joiner, files: list[str], limit: int, backends: list[RasterBackend]) -> int:
+    times = [0.0] * len(backends)
+    tiles = mismatches = 0
+    for file in files:
+        try:
+            states = joiner.get_state_parser(file).states
+        except (OSError, ValueError) as e:
+            print(f"Skipping {file}: {e}")
+            continue
+        keys = list(states)
+        for values in islice(product(*states.values()), limit):
+            state_dict = dict(zip(keys, values))
+            renderers = []
+            try:
+                for i, backend in enumerate(backends):
+                    start = perf_counter()
+                    renderers.append(render(joiner, backend, file, state_dict))
+                    times[i] += perf_counter() - start
+            except (KeyError, ValueError, OSError):
+                # Combinations that aren't real states
+                continue
+            tiles += 1
+            for backend, renderer in zip(backends[1:], renderers[1:]):
+                different = differences(renderers[0], renderer)
+                if different:
+                    mismatches += 1
+                    print(f"{backend.name} differs on {file} {state_dict}: {', '.join(different)}", flush=True)
+    summary = ", ".join(f"{backend.name} {time:.2f}s" for backend, time in zip(backends, times))
+    print(f"{joiner.namespace}: {tiles} states, {mismatches} mismatches ({summary})", flush=True)
+    return mismatches
+
+
+parser = argparse.ArgumentParser(description="Check that every rasterizer backend matches the reference.")
+parser.add_argument("--root", default="assets_renderer/mcassets", help="The assets root.")
+parser.add_argument(
+    "--namespace",
+    action="append",
+    help="Namespaces of block state files to render (default: minecraft and custom).",
+)
+parser.add_argument("--limit", type=int, default=64, help="Maximum number of states per block state file.")
+parser.add_argument("--synthetic", type=int, default=8, help="Number of generated models to render too.")
+args = parser.parse_args()
+
+backends = [RasterBackend.get(name) for name in RasterBackend.available()]
+if len(backends) == 1:
+    print("Only the reference backend is available, install numba to compare it.")
+
+mismatches = 0
+for namespace in args.namespace or ["minecraft", "custom"]:
+    folder = os.path.join(args.root, namespace, "blockstates")
+    if not os.path.isdir(folder):
+        print(f"Skipping {namespace}: {folder} doesn't exist")
+        continue
+    files = sorted(name for name in os.listdir(folder) if name.endswith(".json"))
+    mismatches += compare(Joiner(args.root, namespace, ""), files, args.limit, backends)
+
+with tempfile.TemporaryDirectory() as root:
+    for seed in range(args.synthetic):
+        # Rotated elements, larger textures and 4 y rotations
+        assets = SyntheticAssets(elements=6, rotated=3, texture_size=16 << seed % 3, properties=2, seed=seed)
+        assets.generate(root)
+        mismatches += compare(Joiner(root, SyntheticAssets.namespace, ""), [SyntheticAssets.file], args.limit, backends)
+
+sys.exit(1 if mismatches else 0)
@@ -1,7 +1,202 @@
 from Joiner import Joiner
-
-j = Joiner("assets_renderer/mcassets", "minecraft", "assets")
-j_custom = Joiner("assets_renderer/mcassets", "custom", "assets")
+from Constraints import Constraints
+from Instrumentation import instrumentation
+from TileStore import TileStore
+from AssetManifest import AssetManifest
+from Watcher import Watcher
+from RasterBackend import RasterBackend
+from Preflight import Preflight
+from Scheduler import Scheduler
+from CostModel import CostModel
+from Renderer import PROJECTIONS
+from ParserCollection import ParserCollection
+from Pipeline import Pipeline
+import sys
+import argparse
+
+
+def shard_type(s: str) -> tuple[int, int]:
+    # i/N, with 0 <= i < N
+    try:
+        index, count = map(int, s.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {s}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"expected 0 <= i < N, got {s}")
+    return index, count
+
+
+parser = argparse.ArgumentParser(description="Render the RSM texture atlases.")
+parser.add_argument(
+    "--trace",
+    metavar="FILE",
+    help="Count hot path events and save a Chrome trace of atlases and tiles to FILE.",
+)
+parser.add_argument(
+    "--geometry",
+    metavar="DIR",
+    help="Also export the projected faces of each atlas and a texture sheet to DIR.",
+)
+parser.add_argument(
+    "--geometry-only",
+    action="store_true",
+    help="Only export geometry (requires --geometry), skipping rasterization.",
+)
+parser.add_argument(
+    "--animated",
+    metavar="DIR",
+    help="Also save atlases with animated textures to DIR as strips of frames.",
+)
+parser.add_argument(
+    "--shard",
+    metavar="i/N",
+    type=shard_type,
+    help="Only render shard i of N (0-based) into --tiles, for splitting a build between machines.",
+)
+parser.add_argument(
+    "--merge",
+    action="store_true",
+    help="Assemble the atlases from the tiles in --tiles rendered by all shards.",
+)
+parser.add_argument(
+    "--checkpoint",
+    action="store_true",
+    help="Save each tile to --tiles as soon as it's rendered.",
+)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="Checkpoint, and reuse tiles already in --tiles from an interrupted build.",
+)
+parser.add_argument(
+    "--tiles",
+    metavar="DIR",
+    default="assets_renderer/tiles",
+    help="Folder for sharded and checkpointed tiles (default: %(default)s).",
+)
+parser.add_argument(
+    "--hash-names",
+    action="store_true",
+    help="Save atlases under content-hashed names, recorded in assets/manifest.mjs for long-term caching.",
+)
+parser.add_argument(
+    "--watch",
+    action="store_true",
+    help="After building, keep running and render atlases again when their assets change.",
+)
+parser.add_argument(
+    "--backend",
+    choices=["python", "numba", "auto"],
+    default="python",
+    help="Rasterizer backend; auto uses numba if it's installed (default: %(default)s).",
+)
+parser.add_argument(
+    "--no-preflight",
+    action="store_true",
+    help="Skip checking all assets for errors before rendering.",
+)
+parser.add_argument(
+    "--preflight-only",
+    action="store_true",
+    help="Only check all assets for errors, without rendering.",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Render on this many processes, longest atlases first, through --tiles (default: %(default)s).",
+)
+parser.add_argument(
+    "--costs",
+    metavar="FILE",
+    default="assets_renderer/build_costs.json",
+    help="Timings of past builds, for scheduling with --workers (default: %(default)s).",
+)
+parser.add_argument(
+    "--views",
+    nargs="+",
+    choices=[name for name in PROJECTIONS if name != "oblique"],
+    default=[],
+    help="Also render every atlas in these projections, saved as <atlas>_<view>.png.",
+)
+parser.add_argument(
+    "--state-tables",
+    metavar="DIR",
+    default="assets_renderer/state_tables",
+    help="Folder for compiled block state files, reused until they change (default: %(default)s).",
+)
+parser.add_argument(
+    "--trim",
+    metavar="DIR",
+    help="Also save atlases to DIR as sheets of tiles cropped to their visible pixels, with a json file of their positions.",
+)
+args = parser.parse_args()
+if args.geometry_only and args.geometry is None:
+    parser.error("--geometry-only requires --geometry")
+if args.shard is not None and args.merge:
+    parser.error("--shard and --merge can't be used together")
+if args.watch and (args.shard is not None or args.merge):
+    parser.error("--watch can't be used with --shard or --merge")
+if args.merge and args.resume:
+    parser.error("--merge and --resume can't be used together")
+if args.animated is not None and (args.shard is not None or args.merge):
+    parser.error("--animated can't be used with --shard or --merge")
+if args.workers < 1:
+    parser.error("--workers must be at least 1")
+if args.workers > 1 and (args.shard is not None or args.merge or args.animated is not None or args.trace is not None):
+    parser.error("--workers can't be used with --shard, --merge, --animated or --trace")
+if args.views and (args.shard is not None or args.merge or args.checkpoint or args.resume or args.workers > 1):
+    parser.error("--views can't be used with --shard, --merge, --checkpoint, --resume or --workers")
+use_tiles = args.shard is not None or args.merge or args.checkpoint or args.resume or args.workers > 1
+tiles = TileStore(args.tiles) if use_tiles else None
+manifest = AssetManifest("assets/manifest.mjs")
+if args.trace is not None:
+    instrumentation.enable()
+# Shared by both namespaces, custom models replace vanilla ones with the same path
+models = ParserCollection("assets_renderer/mcassets", "models", overlays=["custom"])
+try:
+    backend = RasterBackend.get(args.backend)
+except ValueError as e:
+    parser.error(str(e))
+
+j = Joiner(
+    "assets_renderer/mcassets",
+    "minecraft",
+    "assets",
+    geometry_root=args.geometry,
+    rasterize=not args.geometry_only,
+    tiles=tiles,
+    shard=args.shard,
+    merge=args.merge,
+    resume=args.resume,
+    manifest=manifest,
+    hash_names=args.hash_names,
+    animation_root=args.animated,
+    backend=backend,
+    views=[PROJECTIONS[name] for name in args.views],
+    state_table_root=args.state_tables,
+    parser_collection=models,
+    trim_root=args.trim,
+)
+j_custom = Joiner(
+    "assets_renderer/mcassets",
+    "custom",
+    "assets",
+    geometry_root=args.geometry,
+    rasterize=not args.geometry_only,
+    tiles=tiles,
+    shard=args.shard,
+    merge=args.merge,
+    resume=args.resume,
+    manifest=manifest,
+    hash_names=args.hash_names,
+    animation_root=args.animated,
+    backend=backend,
+    views=[PROJECTIONS[name] for name in args.views],
+    state_table_root=args.state_tables,
+    parser_collection=models,
+    trim_root=args.trim,
+)
 
 
 def render_blocks():
@@ -36,19 +231,18 @@ def render_blocks():
     j.parse_state(["smooth_stone_slab.json"], ["type"], "smooth_stone_slab.png")
     j.parse_state(["quartz_slab.json"], ["type"], "quartz_slab.png")
 
-    def stair_key(d: dict[str, str], /):
-        return d["shape"] not in {"inner_right", "outer_right"}
+    stair_constraints = Constraints(allowed={"shape": ["straight", "inner_left", "outer_left"]})
     j.parse_state(
         ["polished_andesite_stairs.json"],
         ["facing", "half", "shape"],
         "polished_andesite_stairs.png",
-        key=stair_key,
+        constraints=stair_constraints,
     )
     j.parse_state(
         ["quartz_stairs.json"],
         ["facing", "half", "shape"],
         "quartz_stairs.png",
-        key=stair_key,
+        constraints=stair_constraints,
     )
 
 
@@ -133,7 +327,7 @@ def render_wooden_blocks():
         "weighted_pressure_plate.png",
     )
     j.parse_state(wood("fence_gate"), ["open", "facing", "in_wall"], "fence_gate.png")
-    j.parse_state(wood("leaves", nether=False, azalea=True, bamboo=False), ["distance", "persistent"], "leaves.png", key=lambda d: d["persistent"] == "true", color=lambda _: (0x77, 0xAB, 0x2F, 0xFF))
+    j.parse_state(wood("leaves", nether=False, azalea=True, bamboo=False), ["distance", "persistent"], "leaves.png", constraints=Constraints(fixed={"persistent": "true"}), color=lambda _: (0x77, 0xAB, 0x2F, 0xFF))
     j.parse_state(wood("log", nether=False, bamboo=False), ["axis"], "log.png")
 
 
@@ -171,25 +365,31 @@ def render_stone_blocks():
             stones.append("stone")
         return ["_".join((e, s)) + ".json" for e in stones]
 
-    def wall_key(d: dict[str, str], /):
-        north, west, south, east, up = d["north"], d["west"], d["south"], d["east"], d["up"]
+    def wall_sides(north: str, west: str, south: str, east: str, /):
+        # Can't have low and tall in the same wall block
+        return not {"low", "tall"} <= {north, west, south, east}
+
+    def wall_post(north: str, west: str, south: str, east: str, up: str, /):
         return (
-            # Can't have low and tall in the same wall block
-            not {"low", "tall"} <= {north, west, south, east}
-            and not (up == "true" and north == "low")  # Renders behind the post
-            and (
-                # If center post, no 2 opposite sides can both be tall
-                up == "true" and not (west == east == "tall" or north == south == "tall")
-
-                # No center post means either 2 opposite sides or all 4
-                or up == "false" and (
-                    west == east
-                    and north == south
-                    and not west == north == "none"
-                )
+            # If center post, no 2 opposite sides can both be tall
+            up == "true" and not (west == east == "tall" or north == south == "tall")
+
+            # No center post means either 2 opposite sides or all 4
+            or up == "false" and (
+                west == east
+                and north == south
+                and not west == north == "none"
             )
         )
 
+    wall_constraints = Constraints(
+        relations=[
+            (("north", "west", "south", "east"), wall_sides),
+            (("north", "up"), lambda north, up: not (up == "true" and north == "low")),  # Renders behind the post
+            (("north", "west", "south", "east", "up"), wall_post),
+        ]
+    )
+
     j.parse_state(
         stone("wall", stone=False),
         ["north", "west", "south", "east", "up"],
@@ -201,7 +401,7 @@ def render_stone_blocks():
             "east": ["none", "low", "tall"],
             "up": ["false", "true"],
         },
-        key=wall_key,
+        constraints=wall_constraints,
     )
 
 
@@ -227,9 +427,8 @@ def render_redstone():
 def render_time_takers():
     # Big bombs (long time takers)
     # Redstone wire: takes ~60s
-    def redstone_key(d: dict[str, str], /):
-        sides = (d["north"], d["west"], d["east"], d["south"])
-        return sides.count("none") != 3 and d["east"] != "up" and d["west"] != "up"
+    def redstone_sides(north: str, west: str, east: str, south: str, /):
+        return (north, west, east, south).count("none") != 3
 
     def redstone_color(d: dict[str, str], /):
         # Decompiled source code segment:
@@ -250,13 +449,19 @@ def render_time_takers():
         ["redstone_wire.json"],
         ["power", "north", "west", "east", "south"],
         "redstone_wire.png",
-        key=redstone_key,
+        constraints=Constraints(
+            allowed={"west": ["none", "side"], "east": ["none", "side"]},
+            relations=[(("north", "west", "east", "south"), redstone_sides)],
+        ),
         color=redstone_color,
     )
 
     # Note block: takes ~100s
     j.parse_state(
-        ["note_block.json"], ["powered", "note", "instrument"], "note_block.png", key=lambda d: d["note"] == "0" and d["instrument"] == "harp"
+        ["note_block.json"],
+        ["powered", "note", "instrument"],
+        "note_block.png",
+        constraints=Constraints(fixed={"note": "0", "instrument": "harp"}),
     )
 
 
@@ -310,13 +515,49 @@ def render_custom_blocks():
     j_custom.parse_state(["scaffolding.json"], ["distance", "bottom"], "scaffolding.png")
 
 
-render_blocks()
-render_colored_blocks()
-render_redstone()
-render_rails()
-render_fillers()
-render_storage_blocks()
-render_wooden_blocks()
-render_stone_blocks()
-render_time_takers()
-render_custom_blocks()
+def render_all():
+    render_blocks()
+    render_colored_blocks()
+    render_redstone()
+    render_rails()
+    render_fillers()
+    render_storage_blocks()
+    render_wooden_blocks()
+    render_stone_blocks()
+    render_time_takers()
+    render_custom_blocks()
+
+
+# Merged builds don't read assets, so there's nothing to check
+if (not args.no_preflight or args.preflight_only) and not args.merge:
+    j.plan_only = j_custom.plan_only = True
+    render_all()
+    j.plan_only = j_custom.plan_only = False
+    problems = Preflight([j, j_custom]).run()
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(f"Preflight found {len(problems)} problems, fix them or use --no-preflight.")
+    print("Preflight passed")
+    if args.preflight_only:
+        sys.exit()
+
+if args.workers > 1:
+    # Atlases are only planned here, the scheduler renders them
+    j.plan_only = j_custom.plan_only = True
+    render_all()
+    j.plan_only = j_custom.plan_only = False
+    Scheduler([j, j_custom], CostModel(args.costs), args.workers).run()
+else:
+    # Planned first, so that the next atlases are read while one renders
+    j.plan_only = j_custom.plan_only = True
+    render_all()
+    j.plan_only = j_custom.plan_only = False
+    Pipeline([j, j_custom]).run()
+
+if args.trace is not None:
+    instrumentation.save(args.trace)
+    print(instrumentation.summary())
+
+if args.watch:
+    Watcher([j, j_custom]).run()
@@ -1,4 +1,5 @@
 import { IMAGE_HEIGHT, IMAGE_WIDTH } from "./config.mjs";
+import manifest from "../assets/manifest.mjs";
 
 export const imageURLs = [
     "air.png",
@@ -67,6 +68,14 @@ export const imageURLs = [
     "sand.png",
 ].map(s => `assets/${s}`);
 
+// The renderer can save atlases under content-hashed names,
+// so the file to fetch is looked up in the manifest.
+// Image URLs are still used as block names everywhere else.
+export function resolveURL(imageURL) {
+    const name = imageURL.replace(/^assets\//, "");
+    return `assets/${manifest[name] ?? name}`;
+}
+
 export const promises = [];
 export const blocks = [];
 export const widths = [];
@@ -82,7 +91,7 @@ export async function load_images() {
                     widths[imageURL] = Math.floor(image.width / IMAGE_WIDTH);
                     resolve();
                 };
-                image.src = imageURL;
+                image.src = resolveURL(imageURL);
                 blocks[imageURL] = image;
             }),
         );
@@ -32,7 +32,7 @@ export class Selection {
             const selector_item = document.createElement("div");
             selector_item.id = `selector_item_${i}`;
             selector_item.classList.add("selection_item");
-            selector_item.style.backgroundImage = `url("${Images.imageURLs[i]}")`;
+            selector_item.style.backgroundImage = `url("${Images.resolveURL(Images.imageURLs[i])}")`;
             selector_item.style.backgroundSize = `${Images.widths[Images.imageURLs[i]] * IMAGE_WIDTH / 2}px`;
             selector_item.style.width = `${BLOCK_WIDTH / 2}px`;
             selector_item.style.height = `${BLOCK_FULL_HEIGHT / 2}px`;